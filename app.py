@@ -1,22 +1,34 @@
 import dash
-from dash import html, dcc, Input, Output, State, ALL
+from dash import html, dcc, Input, Output, State, ALL, Patch, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import numpy as np
 import plotly.graph_objects as go
 import os
+import base64
 from flask import Flask
 
-# Importation des classes de pricers
-from option_class.bs_pricer import BS_pricer
-from option_class.binomial_pricer import Binomial_pricer
-from option_class.sabr_pricer import SABR_pricer
-from option_class.heston_pricer import Heston_pricer
-from option_class.merton_pricer import Merton_pricer
-from option_class.vg_pricer import VG_pricer
-from option_class.dupire_pricer import Dupire_pricer
+# Importation des pricers (par nom de modèle), du pricing de grille et du cache de prix
+from option_class.cache import Price_cache
+from option_class.grid import MODELS, create_pricer, iter_price_grid, random_pricing
+from pricing_api import pricing_api
+from pricing_jobs import Pricing_jobs
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.CYBORG])
 server = app.server
+server.register_blueprint(pricing_api)  # API JSON de pricing par lots : POST /api/price
+
+# Cache des prix (prix principal et cases des heatmaps) : un déplacement de curseur ne reprice que les nouvelles cases.
+# Avec PRICE_CACHE_PATH, le cache est un fichier SQLite partagé par les workers gunicorn.
+price_cache = Price_cache(max_size=200000, ttl=24 * 3600, path=os.environ.get('PRICE_CACHE_PATH'))
+
+# Pricing en arrière-plan : les callbacks rendent la main tout de suite, la grille s'affiche ligne par ligne
+pricing_jobs = Pricing_jobs(max_workers=int(os.environ.get('PRICING_THREADS', 4)))
+
+
+def placeholder_local_vol(S, T):
+    """Surface de volatilité locale plate (démonstration du modèle de Dupire), gère les tableaux."""
+    return 0.2 * np.ones_like(S)
 
 # Liste des modèles disponibles
 models = [
@@ -120,9 +132,63 @@ heatmap_params = {
     'DUPIRE': ['S', 'T'],  # For Dupire, using S and T
 }
 
+def typed_array(values, dtype='f4'):
+    """Tableau encodé pour plotly.js (typed array en base64) : bien plus compact qu'une liste JSON de nombres."""
+    values = np.ascontiguousarray(values, dtype='<' + dtype)
+    encoded = {'dtype': dtype, 'bdata': base64.b64encode(values).decode('ascii')}
+    if values.ndim > 1:
+        encoded['shape'] = ', '.join(str(n) for n in values.shape)
+    return encoded
+
+
+def heatmap_figure(title):
+    """Heatmap sans données : mise en page envoyée une seule fois, les prix arrivent ensuite par Patch."""
+    figure = go.Figure(data=go.Heatmap(
+        colorscale='RdYlGn',
+        texttemplate="%{z:.3f}",
+        hovertemplate=f'%{{meta[0]}}: %{{x}}<br>%{{meta[1]}}: %{{y}}<br>{title}: %{{z:.3f}}<extra></extra>',
+    ))
+    figure.update_layout(
+        title=title,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(50,50,50,1)',
+        font_color='white',
+        xaxis=dict(gridcolor='gray'),
+        yaxis=dict(gridcolor='gray'),
+    )
+    return figure
+
+
+def surface_figure(title, z_title):
+    """Surface 3D sans données, complétée par Patch comme heatmap_figure."""
+    figure = go.Figure(data=[go.Surface(
+        colorscale='RdYlGn',
+    )])
+    figure.update_layout(
+        title=title,
+        scene=dict(
+            zaxis_title=z_title,
+            xaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
+            yaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
+            zaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
+            bgcolor='rgb(50,50,50)',
+        ),
+        paper_bgcolor='rgba(0,0,0,0)',
+        font_color='white',
+    )
+    return figure
+
+
+def empty_figures():
+    return (heatmap_figure('Call Price'), heatmap_figure('Put Price'),
+            surface_figure('Surface 3D Call', 'Call Price'), surface_figure('Surface 3D Put', 'Put Price'))
+
 # Mise en page de l'application
 app.layout = dbc.Container([
     dcc.Store(id='stored-params', data={}),
+    dcc.Store(id='pricing-job'),   # Identifiant du calcul en cours (ou message d'erreur de validation)
+    dcc.Store(id='rendered-job'),  # Calcul et version déjà affichés
+    dcc.Interval(id='pricing-interval', interval=250, disabled=True),  # Suivi du calcul en cours
     html.H1("Option Pricer", style={'textAlign': 'center', 'marginTop': '20px'}),
     html.Hr(),
     dbc.Row([
@@ -213,14 +279,14 @@ app.layout = dbc.Container([
             dcc.Tabs(id='tabs', value='tab-1', children=[
                 dcc.Tab(label='Heatmap', value='tab-1', children=[
                     dbc.Row([
-                        dbc.Col(dcc.Graph(id='heatmap-call', style={'height': '60vh'}), width=6),
-                        dbc.Col(dcc.Graph(id='heatmap-put', style={'height': '60vh'}), width=6),
+                        dbc.Col(dcc.Graph(id='heatmap-call', figure=heatmap_figure('Call Price'), style={'height': '60vh'}), width=6),
+                        dbc.Col(dcc.Graph(id='heatmap-put', figure=heatmap_figure('Put Price'), style={'height': '60vh'}), width=6),
                     ])
                 ], style={'backgroundColor': '#303030'}),
                 dcc.Tab(label='3D Surface', value='tab-2', children=[
                     dbc.Row([
-                        dbc.Col(dcc.Graph(id='surface-call', style={'height': '60vh'}), width=6),
-                        dbc.Col(dcc.Graph(id='surface-put', style={'height': '60vh'}), width=6),
+                        dbc.Col(dcc.Graph(id='surface-call', figure=surface_figure('Surface 3D Call', 'Call Price'), style={'height': '60vh'}), width=6),
+                        dbc.Col(dcc.Graph(id='surface-put', figure=surface_figure('Surface 3D Put', 'Put Price'), style={'height': '60vh'}), width=6),
                     ])
                 ], style={'backgroundColor': '#303030'}),
             ], colors={'primary': '#303030', 'background': '#303030'}),
@@ -274,91 +340,54 @@ def update_spot_slider(spot_price):
     marks = {int(i): f'{int(i)}' for i in range(int(min_spot), int(max_spot)+1, 10)}
     return [min_spot, max_spot], min_spot, max_spot, marks
 
-# Callback pour calculer les prix des options et générer les graphiques
+# Callback de soumission : valide les paramètres et lance le pricing en arrière-plan, sans attendre le résultat
 @app.callback(
-    [
-        Output('call-price', 'children'),
-        Output('put-price', 'children'),
-        Output('heatmap-call', 'figure'),
-        Output('heatmap-put', 'figure'),
-        Output('surface-call', 'figure'),
-        Output('surface-put', 'figure'),
-    ],
+    Output('pricing-job', 'data'),
     [
         Input('model-dropdown', 'value'),
         Input({'type': 'parameter-input', 'index': ALL}, 'value'),
         Input('spot-slider', 'value'),
         Input('vol-slider', 'value'),
     ],
-    [State({'type': 'parameter-input', 'index': ALL}, 'id')]
+    [State({'type': 'parameter-input', 'index': ALL}, 'id'),
+     State('pricing-job', 'data')]
 )
-def update_output(model, param_values, spot_range, vol_range, param_ids):
+def submit_pricing(model, param_values, spot_range, vol_range, param_ids, previous_job):
+    # Les paramètres ont changé : le calcul précédent de ce client est dépassé
+    pricing_jobs.cancel((previous_job or {}).get('id'))
     params = {param_id['index']: value for param_id, value in zip(param_ids, param_values)}
     required_params = model_parameters[model]
     # Vérification que tous les paramètres requis sont présents
     if any(param not in params or params[param] in [None, ''] for param in required_params):
-        return "N/A", "N/A", {}, {}, {}, {}
-    # Création de l'instance du pricer
+        return {'error': "N/A"}
+    # Paramètres du pricer
     try:
-        adjusted_params = params.copy()
-        num_simulations = 10000  # Nombre de simulations Monte Carlo
+        pricer_params = params.copy()
+        # Sobol (pont brownien) + contrôle Black-Scholes : erreur inférieure à celle de 10000 trajectoires pseudo-aléatoires
+        num_simulations = 1024  # Nombre de simulations Monte Carlo
+        variance_reduction = 'bs_control_variate'
+        sampling = 'sobol'
+        seed = 0  # Même graine pour toutes les cases de la heatmap : nombres aléatoires communs, surface sans bruit de case à case
         if model == 'HESTON':
-            pricer = Heston_pricer(
-                S=adjusted_params['S'],
-                K=adjusted_params['K'],
-                T=adjusted_params['T'],
-                r=adjusted_params['r'],
-                kappa=adjusted_params['kappa'],
-                theta=adjusted_params['theta'],
-                xi=adjusted_params['xi'],
-                rho=adjusted_params['rho'],
-                v0=adjusted_params['v0'],
-                mu=adjusted_params['mu'],
-                num_simulations=num_simulations
-            )
-        elif model == 'MERTON':
-            pricer = Merton_pricer(
-                S=adjusted_params['S'],
-                K=adjusted_params['K'],
-                T=adjusted_params['T'],
-                r=adjusted_params['r'],
-                sigma=adjusted_params['sigma'],
-                lambda_j=adjusted_params['lambda_j'],
-                mu_j=adjusted_params['mu_j'],
-                sigma_j=adjusted_params['sigma_j'],
-                num_simulations=num_simulations
-            )
-        elif model == 'DUPIRE':
+            pricer_params.update(num_simulations=num_simulations, variance_reduction=variance_reduction,
+                                 sampling=sampling, seed=seed)
+        if model == 'VG':
+            pricer_params['seed'] = seed
+        if model == 'MERTON':
+            pricer_params['method'] = 'analytic'
+        if model == 'DUPIRE':
             # For Dupire model, we need to define a local volatility surface
-            # Here, we'll use a placeholder function for demonstration
-            local_vol_surface = lambda S, T: 0.2 * np.ones_like(S)  # Modifié pour gérer les tableaux
-            pricer = Dupire_pricer(
-                S=adjusted_params['S'],
-                K=adjusted_params['K'],
-                T=adjusted_params['T'],
-                r=adjusted_params['r'],
-                local_vol_surface=local_vol_surface,
-                num_simulations=num_simulations
-            )
-        elif model == 'BS':
+            # Here, we'll use a placeholder function for demonstration (module-level : picklable, donc cachable)
+            pricer_params['local_vol_surface'] = placeholder_local_vol
+            pricer_params['method'] = 'pde'  # Une résolution de l'EDP par ligne de la heatmap, pour tous les spots
+        if model == 'BS' and pricer_params['sigma'] <= 0:
             # Ensure sigma is positive
-            if adjusted_params['sigma'] <= 0:
-                return "Error: Volatility sigma must be positive", "Error: Volatility sigma must be positive", {}, {}, {}, {}
-            pricer = BS_pricer(**adjusted_params)
-        elif model == 'BINOMIAL':
-            pricer = Binomial_pricer(**adjusted_params)
-        elif model == 'SABR':
-            pricer = SABR_pricer(**adjusted_params)
-        elif model == 'VG':
-            pricer = VG_pricer(**adjusted_params)
-        else:
-            return "Unknown model", "Unknown model", {}, {}, {}, {}
-        call_price, put_price = pricer.get_european_option()
-        call_price_str = f"${call_price:.3f}"
-        put_price_str = f"${put_price:.3f}"
+            return {'error': "Error: Volatility sigma must be positive"}
+        if model not in MODELS:
+            return {'error': "Unknown model"}
     except Exception as e:
-        return f"Error: {e}", f"Error: {e}", {}, {}, {}, {}
-    # Génération des graphiques
+        return {'error': f"Error: {e}"}
+    # Axes de la grille
     min_spot, max_spot = spot_range
     S_values = np.linspace(min_spot, max_spot, 11)
     min_vol, max_vol = vol_range
@@ -373,151 +402,102 @@ def update_output(model, param_values, spot_range, vol_range, param_ids):
         y_min = default_values.get(y_param, 0)
         y_max = default_values.get(y_param, 1)
     Y_values = np.linspace(y_min, y_max, 11)
-    X_grid, Y_grid = np.meshgrid(S_values, Y_values)
-    call_prices = np.zeros_like(X_grid)
-    put_prices = np.zeros_like(X_grid)
-    for i in range(X_grid.shape[0]):
-        for j in range(X_grid.shape[1]):
-            params_loop = adjusted_params.copy()
-            params_loop[x_param] = X_grid[i, j]
-            params_loop[y_param] = Y_grid[i, j]
-            try:
-                if model == 'HESTON':
-                    pricer_loop = Heston_pricer(
-                        S=params_loop['S'],
-                        K=params_loop['K'],
-                        T=params_loop['T'],
-                        r=params_loop['r'],
-                        kappa=params_loop['kappa'],
-                        theta=params_loop['theta'],
-                        xi=params_loop['xi'],
-                        rho=params_loop['rho'],
-                        v0=params_loop['v0'],
-                        mu=params_loop['mu'],
-                        num_simulations=num_simulations
-                    )
-                elif model == 'MERTON':
-                    pricer_loop = Merton_pricer(
-                        S=params_loop['S'],
-                        K=params_loop['K'],
-                        T=params_loop['T'],
-                        r=params_loop['r'],
-                        sigma=params_loop['sigma'],
-                        lambda_j=params_loop['lambda_j'],
-                        mu_j=params_loop['mu_j'],
-                        sigma_j=params_loop['sigma_j'],
-                        num_simulations=num_simulations
-                    )
-                elif model == 'DUPIRE':
-                    pricer_loop = Dupire_pricer(
-                        S=params_loop['S'],
-                        K=params_loop['K'],
-                        T=params_loop['T'],
-                        r=params_loop['r'],
-                        local_vol_surface=local_vol_surface,
-                        num_simulations=num_simulations
-                    )
-                elif model == 'BS':
-                    # Ensure sigma is positive
-                    if params_loop['sigma'] <= 0:
-                        call_prices[i, j] = np.nan
-                        put_prices[i, j] = np.nan
-                        continue
-                    pricer_loop = BS_pricer(**params_loop)
-                elif model == 'BINOMIAL':
-                    pricer_loop = Binomial_pricer(**params_loop)
-                elif model == 'SABR':
-                    pricer_loop = SABR_pricer(**params_loop)
-                elif model == 'VG':
-                    pricer_loop = VG_pricer(**params_loop)
-                else:
-                    continue
-                call, put = pricer_loop.get_european_option()
-                call_prices[i, j] = call
-                put_prices[i, j] = put
-            except:
-                call_prices[i, j] = np.nan
-                put_prices[i, j] = np.nan
-    # Création des figures
-    heatmap_call = go.Figure(data=go.Heatmap(
-        z=call_prices,
-        x=S_values,
-        y=Y_values,
-        colorscale='RdYlGn',
-        text=np.round(call_prices, 3),
-        texttemplate="%{text}",
-        hovertemplate=f'{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Call Price: %{{z:.3f}}<extra></extra>',
-    ))
-    heatmap_call.update_layout(
-        title='Call Price',
-        xaxis_title=x_label,
-        yaxis_title=y_label,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(50,50,50,1)',
-        font_color='white',
-        xaxis=dict(gridcolor='gray'),
-        yaxis=dict(gridcolor='gray'),
-    )
-    heatmap_put = go.Figure(data=go.Heatmap(
-        z=put_prices,
-        x=S_values,
-        y=Y_values,
-        colorscale='RdYlGn',
-        text=np.round(put_prices, 3),
-        texttemplate="%{text}",
-        hovertemplate=f'{x_label}: %{{x}}<br>{y_label}: %{{y}}<br>Put Price: %{{z:.3f}}<extra></extra>',
-    ))
-    heatmap_put.update_layout(
-        title='Put Price',
-        xaxis_title=x_label,
-        yaxis_title=y_label,
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(50,50,50,1)',
-        font_color='white',
-        xaxis=dict(gridcolor='gray'),
-        yaxis=dict(gridcolor='gray'),
-    )
-    surface_call = go.Figure(data=[go.Surface(
-        z=call_prices,
-        x=S_values,
-        y=Y_values,
-        colorscale='RdYlGn',
-    )])
-    surface_call.update_layout(
-        title='Surface 3D Call',
-        scene=dict(
-            xaxis_title=x_label,
-            yaxis_title=y_label,
-            zaxis_title='Call Price',
-            xaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            yaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            zaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            bgcolor='rgb(50,50,50)',
-        ),
-        paper_bgcolor='rgba(0,0,0,0)',
-        font_color='white',
-    )
-    surface_put = go.Figure(data=[go.Surface(
-        z=put_prices,
-        x=S_values,
-        y=Y_values,
-        colorscale='RdYlGn',
-    )])
-    surface_put.update_layout(
-        title='Surface 3D Put',
-        scene=dict(
-            xaxis_title=x_label,
-            yaxis_title=y_label,
-            zaxis_title='Put Price',
-            xaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            yaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            zaxis=dict(backgroundcolor='rgb(50,50,50)', gridcolor='gray'),
-            bgcolor='rgb(50,50,50)',
-        ),
-        paper_bgcolor='rgba(0,0,0,0)',
-        font_color='white',
-    )
-    return call_price_str, put_price_str, heatmap_call, heatmap_put, surface_call, surface_put
+    job_id = pricing_jobs.submit(
+        price_job, model, pricer_params, x_param, S_values, y_param, Y_values,
+        initial={'x_values': S_values, 'y_values': Y_values, 'x_label': x_label, 'y_label': y_label})
+    return {'id': job_id}
+
+
+def price_job(job, model, pricer_params, x_param, x_values, y_param, y_values):
+    """Pricing en arrière-plan : prix principal d'abord (rapide), puis la grille ligne par ligne."""
+    try:
+        if random_pricing(model, pricer_params):  # Monte Carlo sans graine : un nouveau tirage à chaque fois
+            call_price, put_price = create_pricer(model, pricer_params).get_european_option()
+        else:
+            call_price, put_price = price_cache.get_or_compute(
+                model, pricer_params, lambda: create_pricer(model, pricer_params).get_european_option())
+    except Exception as e:
+        job.update(call_price=f"Error: {e}", put_price=f"Error: {e}")
+        return
+    job.update(call_price=f"${call_price:.3f}", put_price=f"${put_price:.3f}")
+    # Pricing vectorisé ou groupé par ligne selon le modèle (cases invalides à NaN), publié après chaque ligne
+    for call_prices, put_prices, pending in iter_price_grid(model, pricer_params, x_param, x_values, y_param, y_values,
+                                                            cache=price_cache):
+        if job.cancelled:
+            return
+        job.update(call_prices=call_prices.copy(), put_prices=put_prices.copy(), pending=int(pending.sum()))
+
+
+def figure_patch(z, job, new_job, surface=False):
+    """Mise à jour partielle d'une figure : les prix, plus les axes et leurs titres pour un nouveau calcul."""
+    patch = Patch()
+    patch['data'][0]['z'] = typed_array(z)
+    if new_job:
+        patch['data'][0]['x'] = typed_array(job['x_values'], 'f8')
+        patch['data'][0]['y'] = typed_array(job['y_values'], 'f8')
+        axes = patch['layout']['scene'] if surface else patch['layout']
+        axes['xaxis']['title']['text'] = job['x_label']
+        axes['yaxis']['title']['text'] = job['y_label']
+        if not surface:
+            patch['data'][0]['meta'] = [job['x_label'], job['y_label']]  # Libellés du survol de la heatmap
+    return patch
+
+# Callback de suivi : affiche les résultats (partiels) du calcul en cours, interrogé par pricing-interval
+# Seules les figures de l'onglet actif sont mises à jour, par des mises à jour partielles (Patch) : la mise en page
+# reste dans le navigateur et seuls les tableaux de prix, encodés en binaire, sont envoyés.
+@app.callback(
+    [
+        Output('call-price', 'children'),
+        Output('put-price', 'children'),
+        Output('heatmap-call', 'figure'),
+        Output('heatmap-put', 'figure'),
+        Output('surface-call', 'figure'),
+        Output('surface-put', 'figure'),
+        Output('pricing-interval', 'disabled'),
+        Output('rendered-job', 'data'),
+    ],
+    [
+        Input('pricing-job', 'data'),
+        Input('pricing-interval', 'n_intervals'),
+        Input('tabs', 'value'),
+    ],
+    State('rendered-job', 'data'),
+)
+def update_output(pricing_job, n_intervals, tab, rendered_job):
+    if not pricing_job:
+        raise PreventUpdate
+    job = pricing_jobs.get(pricing_job['id']) if pricing_job.get('id') else None
+    if job is None or job['status'] == 'error' or str(job.get('call_price')).startswith('Error'):
+        # Erreur de validation ou de pricing, ou calcul oublié (redémarrage du serveur) : figures vides
+        if pricing_job.get('error'):
+            call_price_str = put_price_str = pricing_job['error']
+        elif job is None:
+            call_price_str = put_price_str = "N/A"
+        elif job['status'] == 'error':
+            call_price_str = put_price_str = f"Error: {job['error']}"
+        else:
+            call_price_str, put_price_str = job['call_price'], job['put_price']
+        return (call_price_str, put_price_str) + empty_figures() + (True, None)
+
+    finished = job['status'] in ('done', 'cancelled')
+    rendered_job = rendered_job or {}
+    current = {'id': job['id'], 'version': job['version']}
+    if rendered_job.get(tab) == current:
+        # Rien de nouveau depuis le dernier affichage de cet onglet : seul l'arrêt du suivi est éventuellement envoyé
+        if not finished:
+            raise PreventUpdate
+        return (no_update,) * 6 + (True, no_update)
+
+    figures = [no_update] * 4
+    if 'call_prices' in job:
+        new_job = (rendered_job.get(tab) or {}).get('id') != job['id']
+        first = 0 if tab == 'tab-1' else 2
+        figures[first] = figure_patch(job['call_prices'], job, new_job, surface=first == 2)
+        figures[first + 1] = figure_patch(job['put_prices'], job, new_job, surface=first == 2)
+        rendered_job = dict(rendered_job, **{tab: current})
+    call_price_str = job.get('call_price', no_update)
+    put_price_str = job.get('put_price', no_update)
+    return (call_price_str, put_price_str) + tuple(figures) + (finished, rendered_job)
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
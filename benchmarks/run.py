@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import scipy
+
+from option_class.batch import price_rows
+from option_class.binomial_pricer import Binomial_pricer
+from option_class.bs_pricer import BS_pricer
+from option_class.grid import create_pricer
+from option_class.pde_pricer import PDE_pricer
+
+# Benchmarks de performance et de précision des pricers
+#     python -m benchmarks.run --save benchmarks/baseline.json      (nouvelle référence)
+#     python -m benchmarks.run --compare benchmarks/baseline.json   (code de sortie 1 en cas de régression)
+# Trois familles de mesures, chacune identifiée par un nom stable :
+# - latence : durée médiane d'un pricing (s) par modèle et méthode, selon le nombre de trajectoires, de pas
+#   ou de noeuds ;
+# - débit : lignes pricées par seconde par batch.price_rows (chemin de l'API et du pricing de book), selon la taille
+#   du lot ;
+# - précision : écart absolu maximal (Call et Put) à une référence : Black-Scholes pour l'arbre binomial, Merton
+#   sans sauts et Dupire à volatilité constante, série de Merton avec sauts pour Merton, quadrature de Heston
+#   à haute précision pour Heston, FFT pour VG (avec asymétrie), arbre binomial fin pour l'EDP américaine.
+#   Pour les Monte Carlo, l'écart d'un tirage n'est pas comparable d'une version à l'autre (tout changement du
+#   découpage ou de l'ordre des tirages le rebat) : on mesure l'écart en erreurs standard (z-score), comparé à une
+#   borne fixe z_bound et non à la référence enregistrée.
+# Les résultats sont enregistrés en JSON avec la machine et les versions ; la comparaison signale les latences
+# (et débits) dégradés au-delà de threshold, les erreurs accrues au-delà de accuracy_threshold (avec une
+# tolérance absolue accuracy_floor pour les erreurs proches de zéro) et les z-scores au-delà de z_bound.
+# Les durées dépendent de la machine : comparer à une référence produite sur la même machine.
+
+BS_PARAMS = dict(S=100.0, K=100.0, T=1.0, r=0.05, sigma=0.2)
+SABR_PARAMS = dict(S=100.0, K=100.0, T=1.0, alpha=0.3, beta=0.7, rho=-0.3, nu=0.4)
+HESTON_PARAMS = dict(S=100.0, K=100.0, T=1.0, r=0.05, kappa=2.0, theta=0.04, xi=0.3, rho=-0.7, v0=0.04, mu=0.05)
+MERTON_PARAMS = dict(BS_PARAMS, lambda_j=0.5, mu_j=-0.1, sigma_j=0.2)
+VG_PARAMS = dict(S=100.0, K=100.0, T=1.0, r=0.05, sigma=0.2, theta=-0.1, nu=0.2)
+DUPIRE_PARAMS = dict(S=100.0, K=100.0, T=1.0, r=0.05, local_vol_surface=0.2)
+
+METRICS = {  # Sens d'une dégradation : 'up' si une hausse est une régression
+    'latency_s': 'up',
+    'rows_per_s': 'down',
+    'abs_error': 'up',
+    'z_score': 'up',
+}
+
+
+def latency_cases(quick=False):
+    """(nom, modèle, paramètres) des pricings chronométrés."""
+    simulations = (10000,) if quick else (10000, 100000)
+    cases = [('BS', 'BS', BS_PARAMS), ('SABR', 'SABR', SABR_PARAMS)]
+    for steps in ((100, 500) if quick else (100, 500, 2000)):
+        cases.append(('BINOMIAL steps=%d' % steps, 'BINOMIAL', dict(BS_PARAMS, steps=steps)))
+    for n in simulations:
+        for num_steps in ((50,) if quick else (50, 200)):
+            cases.append(('HESTON mc n=%d steps=%d' % (n, num_steps), 'HESTON',
+                          dict(HESTON_PARAMS, num_simulations=n, num_steps=num_steps, seed=0)))
+        cases.append(('MERTON mc n=%d' % n, 'MERTON', dict(MERTON_PARAMS, num_simulations=n, seed=0)))
+        cases.append(('VG mc n=%d' % n, 'VG', dict(VG_PARAMS, num_simulations=n, seed=0)))
+        cases.append(('DUPIRE mc n=%d steps=100' % n, 'DUPIRE', dict(DUPIRE_PARAMS, num_simulations=n, seed=0)))
+    cases += [
+        ('HESTON quad', 'HESTON', dict(HESTON_PARAMS, method='quad')),
+        ('HESTON fft', 'HESTON', dict(HESTON_PARAMS, method='fft')),
+        ('MERTON analytic', 'MERTON', dict(MERTON_PARAMS, method='analytic')),
+        ('MERTON fft', 'MERTON', dict(MERTON_PARAMS, method='fft')),
+        ('VG fft', 'VG', dict(VG_PARAMS, method='fft')),
+    ]
+    for num_space in ((200,) if quick else (200, 800)):
+        cases.append(('DUPIRE pde space=%d' % num_space, 'DUPIRE',
+                      dict(DUPIRE_PARAMS, method='pde', num_space=num_space)))
+    return cases
+
+
+def throughput_cases(quick=False):
+    """(nom, modèle, paramètres, taille du lot) des lots pricés par price_rows (strikes différents par ligne)."""
+    sizes = (1, 100) if quick else (1, 100, 10000)
+    models = [
+        ('BS', BS_PARAMS, sizes),
+        ('SABR', SABR_PARAMS, sizes),
+        ('BINOMIAL', dict(BS_PARAMS, steps=200), sizes[:2]),
+        ('HESTON', dict(HESTON_PARAMS, method='quad'), sizes),
+        ('MERTON', dict(MERTON_PARAMS, method='analytic'), sizes),
+        ('DUPIRE', dict(DUPIRE_PARAMS, method='pde'), sizes[:2]),
+    ]
+    return [('%s batch=%d' % (model, size), model, params, size) for model, params, model_sizes in models
+            for size in model_sizes]
+
+
+def _bs_reference(params):
+    return BS_pricer(*(params[name] for name in ('S', 'K', 'T', 'r', 'sigma'))).get_european_option()
+
+
+def accuracy_cases():
+    """(nom, fonction, référence) : fonctions sans argument renvoyant les prix Call et Put à comparer."""
+    merton_no_jumps = dict(BS_PARAMS, lambda_j=0.0, mu_j=-0.1, sigma_j=0.2)
+    american = dict(S=100.0, K=110.0, T=1.0, r=0.05)
+    cases = []
+    for steps in (100, 1000):
+        cases.append(('BINOMIAL steps=%d vs BS' % steps,
+                      lambda steps=steps: Binomial_pricer(**BS_PARAMS, steps=steps).get_european_option(),
+                      lambda: _bs_reference(BS_PARAMS)))
+    cases += [
+        ('MERTON analytic lambda=0 vs BS',
+         lambda: create_pricer('MERTON', dict(merton_no_jumps, method='analytic')).get_european_option(),
+         lambda: _bs_reference(BS_PARAMS)),
+        ('MERTON fft vs analytic',
+         lambda: create_pricer('MERTON', dict(MERTON_PARAMS, method='fft')).get_european_option(),
+         lambda: create_pricer('MERTON', dict(MERTON_PARAMS, method='analytic')).get_european_option()),
+        ('HESTON quad vs reference',
+         lambda: create_pricer('HESTON', dict(HESTON_PARAMS, method='quad')).get_european_option(),
+         lambda: _heston_reference()),
+        ('HESTON fft vs reference',
+         lambda: create_pricer('HESTON', dict(HESTON_PARAMS, method='fft')).get_european_option(),
+         lambda: _heston_reference()),
+        ('DUPIRE pde constant vol vs BS',
+         lambda: create_pricer('DUPIRE', dict(DUPIRE_PARAMS, method='pde')).get_european_option(),
+         lambda: _bs_reference(BS_PARAMS)),
+        ('PDE american vs BINOMIAL steps=5000',
+         lambda: PDE_pricer(0.2, **american).get_american_option(),
+         lambda: Binomial_pricer(**american, sigma=0.2, steps=5000).get_american_option()),
+    ]
+    return cases
+
+
+def z_score_cases():
+    """(nom, modèle, paramètres, référence) des Monte Carlo, dont l'écart est mesuré en erreurs standard."""
+    merton_no_jumps = dict(BS_PARAMS, lambda_j=0.0, mu_j=-0.1, sigma_j=0.2)
+    return [
+        ('MERTON mc lambda=0 n=100000 vs BS', 'MERTON', dict(merton_no_jumps, num_simulations=100000, seed=0),
+         lambda: _bs_reference(BS_PARAMS)),
+        ('MERTON mc n=100000 vs analytic', 'MERTON', dict(MERTON_PARAMS, num_simulations=100000, seed=0),
+         lambda: create_pricer('MERTON', dict(MERTON_PARAMS, method='analytic')).get_european_option()),
+        ('HESTON mc n=100000 steps=100 vs reference', 'HESTON', dict(HESTON_PARAMS, num_simulations=100000, seed=0),
+         lambda: _heston_reference()),
+        ('VG mc n=100000 vs fft', 'VG', dict(VG_PARAMS, num_simulations=100000, seed=0),
+         lambda: create_pricer('VG', dict(VG_PARAMS, method='fft')).get_european_option()),
+        ('DUPIRE mc constant vol n=100000 vs BS', 'DUPIRE', dict(DUPIRE_PARAMS, num_simulations=100000, seed=0),
+         lambda: _bs_reference(BS_PARAMS)),
+    ]
+
+
+def _heston_reference():
+    """Prix de Heston à haute précision : quadrature fine, tolérance de troncature serrée."""
+    params = dict(HESTON_PARAMS, method='quad', num_nodes=4096, tol=1e-14)
+    return create_pricer('HESTON', params).get_european_option()
+
+
+def measure(function, repeat=5, budget=1.0):
+    """Durée médiane d'un appel de function (après un appel de chauffe, sauf si celui-ci dépasse budget)."""
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+    if first > budget:
+        return first
+    durations = []
+    while len(durations) < repeat and sum(durations) < budget:
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def run(quick=False, only=None, progress=True):
+    """Résultats {nom: {'metric': ..., 'value': ...}} des benchmarks dont le nom contient only."""
+    results = {}
+
+    def record(name, metric, value):
+        results[name] = {'metric': metric, 'value': float(value)}
+        if progress:
+            print("%-52s %-10s %.6g" % (name, metric, value), file=sys.stderr, flush=True)
+
+    for name, model, params in latency_cases(quick):
+        name = 'latency: ' + name
+        if only is None or only in name:
+            record(name, 'latency_s', measure(lambda: create_pricer(model, params).get_european_option()))
+
+    for name, model, params, size in throughput_cases(quick):
+        name = 'throughput: ' + name
+        if only is None or only in name:
+            strikes = np.linspace(0.8, 1.2, size) * params['K']
+            rows = [dict(params, K=float(K)) for K in strikes]
+            record(name, 'rows_per_s', size / measure(lambda: price_rows(model, rows)))
+
+    for name, function, reference in accuracy_cases():
+        name = 'accuracy: ' + name
+        if only is None or only in name:
+            error = np.max(np.abs(np.subtract(function(), reference())))
+            record(name, 'abs_error', error)
+
+    for name, model, params, reference in z_score_cases():
+        name = 'accuracy: ' + name
+        if only is None or only in name:
+            pricer = create_pricer(model, params)
+            error = np.abs(np.subtract(pricer.get_european_option(), reference()))
+            record(name, 'z_score', np.max(error / np.asarray(pricer.std_errors)))
+    return results
+
+
+def environment():
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+    }
+
+
+def compare(results, baseline, threshold=0.25, accuracy_threshold=0.1, accuracy_floor=1e-6, z_bound=4.0):
+    """Lignes (nom, métrique, référence, valeur, variation relative, régression) des mesures communes.
+
+    Régression : latence au-delà de (1 + threshold) fois la référence, débit en deçà de la référence divisée
+    par (1 + threshold), erreur au-delà de (1 + accuracy_threshold) fois la référence plus accuracy_floor,
+    z-score au-delà de z_bound (quelle que soit la référence).
+    """
+    rows = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        metric, value, reference = result['metric'], result['value'], baseline[name]['value']
+        if metric == 'z_score':
+            regressed = value > z_bound
+        elif metric == 'abs_error':
+            regressed = value > reference * (1 + accuracy_threshold) + accuracy_floor
+        elif METRICS[metric] == 'up':
+            regressed = value > reference * (1 + threshold)
+        else:
+            regressed = value < reference / (1 + threshold)
+        change = value / reference - 1 if reference else float('inf') if value else 0.0
+        rows.append((name, metric, reference, value, change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run',
+                                     description="Latency, throughput and accuracy benchmarks of the pricers.")
+    parser.add_argument('--quick', action='store_true', help="smaller grid of paths, steps and batch sizes")
+    parser.add_argument('--only', help="run the benchmarks whose name contains this string")
+    parser.add_argument('--save', metavar='PATH', help="write the results as a JSON baseline")
+    parser.add_argument('--compare', metavar='PATH', help="compare the results with a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="relative slowdown flagged as a regression (default 0.25)")
+    parser.add_argument('--accuracy-threshold', type=float, default=0.1,
+                        help="relative error increase flagged as a regression (default 0.1)")
+    parser.add_argument('--accuracy-floor', type=float, default=1e-6,
+                        help="absolute error increase always tolerated (default 1e-6)")
+    parser.add_argument('--z-bound', type=float, default=4.0,
+                        help="Monte Carlo error, in standard errors, flagged as a regression (default 4)")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.only)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+            f.write('\n')
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)['results']
+    rows = compare(results, baseline, args.threshold, args.accuracy_threshold, args.accuracy_floor,
+                   args.z_bound)
+    print("%-52s %-10s %12s %12s %8s" % ('benchmark', 'metric', 'baseline', 'current', 'change'))
+    for name, metric, reference, value, change, regressed in rows:
+        print("%-52s %-10s %12.6g %12.6g %+7.1f%%%s" % (name, metric, reference, value, 100 * change,
+                                                      '  REGRESSION' if regressed else ''))
+    missing = sorted(set(results) - set(baseline))
+    if missing:
+        print("Not in the baseline: %s" % ', '.join(missing))
+    regressions = sum(row[-1] for row in rows)
+    print("%d regression(s) out of %d benchmarks" % (regressions, len(rows)))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,4 +4,13 @@ from option_class.sabr_pricer import SABR_pricer
 from option_class.heston_pricer import Heston_pricer
 from option_class.merton_pricer import Merton_pricer
 from option_class.vg_pricer import VG_pricer
-from option_class.dupire_pricer import Dupire_pricer
\ No newline at end of file
+from option_class.dupire_pricer import Dupire_pricer
+from option_class.fft_pricer import FFT_pricer
+from option_class.pde_pricer import PDE_pricer
+from option_class.local_vol_surface import LocalVol_surface
+from option_class.implied_vol import implied_volatility
+from option_class.sabr_pricer import calibrate_sabr
+from option_class.heston_calibration import Heston_calibrator
+from option_class.grid import price_grid
+from option_class.cache import Price_cache
+from option_class.batch import price_batch
\ No newline at end of file
@@ -0,0 +1,127 @@
+import numpy as np
+
+from option_class.cache import cache_key
+from option_class.grid import MODELS, create_pricer, price_arrays, vector_params
+
+# Pricing d'un lot de demandes hétérogènes (API de pricing, pricing d'un book)
+# Chaque demande est un modèle (clé de MODELS) et les arguments du constructeur de son pricer.
+# Les demandes sont regroupées par modèle puis par valeur des paramètres que le pricer n'accepte pas sous forme de
+# tableau : chaque groupe est pricé en un seul appel vectorisé (price_arrays), le long des paramètres vectorisés
+# du modèle (S, K, ... : vector_params). Si l'appel groupé échoue, le groupe est repricé demande par demande pour que
+# chaque erreur soit attribuée à sa demande. Les grecques sont calculées en un appel pour Black-Scholes, demande par
+# demande pour les autres modèles qui en fournissent (pas l'arbre binomial).
+
+
+def _group_rows(model, rows):
+    """Indices des demandes regroupés par paramètres non vectorisés (et noms des paramètres vectorisés présents)."""
+    groups = {}
+    for index, params in enumerate(rows):
+        vectorized = vector_params(model, params)
+        names = tuple(name for name in vectorized if name in params)
+        key = cache_key(model, {name: value for name, value in params.items() if name not in names})
+        # Paramètres non normalisables (lambda) : demande pricée seule
+        groups.setdefault((key, names) if key is not None else (index,), []).append(index)
+    return groups.values()
+
+
+def _greeks_dict(call_greeks, put_greeks, k=()):
+    return {'call': {name: float(np.asarray(value)[k]) for name, value in call_greeks.items()},
+            'put': {name: float(np.asarray(value)[k]) for name, value in put_greeks.items()}}
+
+
+def price_rows(model, rows, greeks=False):
+    """Prix (et grecques) d'une liste de demandes d'un même modèle (dictionnaires de paramètres).
+
+    Renvoie les tableaux des prix Call et Put, la liste des grecques ({'call': ..., 'put': ...} ou None) et la liste
+    des erreurs (message ou None), dans l'ordre des demandes. Les prix non calculables valent NaN.
+    """
+    n = len(rows)
+    call_prices = np.full(n, np.nan)
+    put_prices = np.full(n, np.nan)
+    all_greeks = [None] * n
+    errors = [None] * n
+    if model not in MODELS:
+        return call_prices, put_prices, all_greeks, ["Unknown model: %s" % model] * n
+
+    for indices in _group_rows(model, rows):
+        params = rows[indices[0]]
+        names = tuple(name for name in vector_params(model, params) if name in params)
+        grouped = False
+        if len(indices) > 1 and names:
+            arrays = {name: np.array([rows[i][name] for i in indices], dtype=float) for name in names}
+            base = {name: value for name, value in params.items() if name not in names}
+            if 'S' in arrays and np.max(arrays['S']) > 0:
+                base['S'] = float(np.max(arrays['S']))  # Spot de simulation des modèles remis à l'échelle
+            try:
+                call_prices[indices], put_prices[indices] = price_arrays(model, base, arrays)
+                grouped = True
+            except Exception:
+                pass  # Repricing demande par demande ci-dessous, pour attribuer chaque erreur
+        if not grouped:
+            for i in indices:
+                try:
+                    call_prices[i], put_prices[i] = create_pricer(model, rows[i]).get_european_option()
+                except Exception as e:
+                    errors[i] = str(e) or type(e).__name__
+        for i in indices:
+            if errors[i] is None and not (np.isfinite(call_prices[i]) and np.isfinite(put_prices[i])):
+                errors[i] = "Invalid parameters"
+
+        # Grecques des seules demandes pricées sans erreur
+        if not greeks or not hasattr(MODELS[model], 'get_greeks'):
+            continue
+        if grouped and model == 'BS':
+            call_greeks, put_greeks = create_pricer(model, dict(base, **arrays)).get_greeks()
+            for k, i in enumerate(indices):
+                if errors[i] is None:
+                    all_greeks[i] = _greeks_dict(call_greeks, put_greeks, k)
+            continue
+        for i in indices:
+            if errors[i] is None:
+                try:
+                    all_greeks[i] = _greeks_dict(*create_pricer(model, rows[i]).get_greeks())
+                except Exception as e:
+                    errors[i] = str(e) or type(e).__name__
+    return call_prices, put_prices, all_greeks, errors
+
+
+def iter_price_batch(requests, greeks=False, chunk_size=1000):
+    """Résultats d'une suite de demandes {'model': ..., 'params': {...}}, produits dans l'ordre, par paquets.
+
+    Chaque paquet de chunk_size demandes est regroupé par modèle et pricé avant d'être rendu : la mémoire reste bornée
+    quelle que soit la longueur de la suite. Chaque résultat contient 'model', 'call', 'put' et, selon le cas,
+    'greeks' et 'error'.
+    """
+    chunk = []
+    for request in requests:
+        chunk.append(request)
+        if len(chunk) == chunk_size:
+            yield from _price_chunk(chunk, greeks)
+            chunk = []
+    if chunk:
+        yield from _price_chunk(chunk, greeks)
+
+
+def _price_chunk(requests, greeks):
+    results = [None] * len(requests)
+    by_model = {}
+    for index, request in enumerate(requests):
+        by_model.setdefault(request['model'], []).append(index)
+    for model, indices in by_model.items():
+        call_prices, put_prices, all_greeks, errors = price_rows(model, [requests[i]['params'] for i in indices],
+                                                                 greeks)
+        for k, i in enumerate(indices):
+            result = {'model': model,
+                      'call': float(call_prices[k]) if errors[k] is None else None,
+                      'put': float(put_prices[k]) if errors[k] is None else None}
+            if greeks:
+                result['greeks'] = all_greeks[k]
+            if errors[k] is not None:
+                result['error'] = errors[k]
+            results[i] = result
+    return results
+
+
+def price_batch(requests, greeks=False):
+    """Liste des résultats de iter_price_batch pour toutes les demandes."""
+    return list(iter_price_batch(requests, greeks))
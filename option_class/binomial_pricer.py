@@ -4,6 +4,7 @@ import numpy as np
 # Utilisé pour évaluer les options en construisant un arbre binomial où le prix du sous-jacent évolue de manière discrète.
 # Particulièrement utile pour les options américaines ou européennes, car il permet de modéliser l'exercice anticipé (pour les options américaines).
 # La précision augmente avec le nombre d'étapes dans l'arbre.
+# S et K peuvent être des tableaux : toutes les combinaisons (broadcasting) sont remontées ensemble sur le même arbre.
 
 class Binomial_pricer:
     def __init__(self, S, K, T, r, sigma, steps):
@@ -16,8 +17,8 @@ class Binomial_pricer:
         self.sigma = sigma   # Volatilité
         if steps <= 0:
             raise ValueError("Number of steps must be positive")
-        self.steps = steps   # Nombre d'étapes dans l'arbre binomial
-        self.dt = T / steps  # Taille d'un intervalle de temps
+        self.steps = int(steps)  # Nombre d'étapes dans l'arbre binomial
+        self.dt = T / self.steps  # Taille d'un intervalle de temps
         self.u = np.exp(sigma * np.sqrt(self.dt))  # Facteur de hausse
         self.d = 1 / self.u  # Facteur de baisse
         denominator = self.u - self.d
@@ -25,20 +26,37 @@ class Binomial_pricer:
             raise ValueError("Invalid parameters leading to division by zero in probability calculation.")
         self.q = (np.exp(r * self.dt) - self.d) / denominator  # Probabilité de montée
 
-    def get_european_option(self):
-        stock_price = np.zeros(self.steps + 1)
-        call_price = np.zeros(self.steps + 1)
-        put_price = np.zeros(self.steps + 1)
-
-        for i in range(self.steps + 1):
-            stock_price[i] = self.S * (self.u ** (self.steps - i)) * (self.d ** i)
-            call_price[i] = max(0, stock_price[i] - self.K)
-            put_price[i] = max(0, self.K - stock_price[i])
-        
-        # Calcul du prix des options en remontant l'arbre
+    def stock_prices(self, step):
+        """Prix du sous-jacent aux noeuds d'une étape, du plus haut au plus bas (dernier axe)."""
+        i = np.arange(step + 1)
+        S = np.asarray(self.S, dtype=float)[..., np.newaxis]
+        return S * self.u ** (step - i) * self.d ** i
+
+    def _rollback(self, american):
+        # Axes de tête : batch (S, K broadcastés) ; dernier axe : noeuds de l'arbre
+        K = np.asarray(self.K, dtype=float)[..., np.newaxis]
+        stock_price = self.stock_prices(self.steps)
+        call_price = np.maximum(stock_price - K, 0)
+        put_price = np.maximum(K - stock_price, 0)
+        call_price, put_price = np.broadcast_arrays(call_price, put_price)
+        call_price, put_price = call_price.copy(), put_price.copy()
+
+        discount = np.exp(-self.r * self.dt)
+        p_up = discount * self.q
+        p_down = discount * (1 - self.q)
+        # Calcul du prix des options en remontant l'arbre, une étape entière par opération vectorielle
         for step in range(self.steps - 1, -1, -1):
-            for i in range(step + 1):
-                call_price[i] = np.exp(-self.r * self.dt) * (self.q * call_price[i] + (1 - self.q) * call_price[i + 1])
-                put_price[i] = np.exp(-self.r * self.dt) * (self.q * put_price[i] + (1 - self.q) * put_price[i + 1])
+            call_price = p_up * call_price[..., :-1] + p_down * call_price[..., 1:]
+            put_price = p_up * put_price[..., :-1] + p_down * put_price[..., 1:]
+            if american:
+                stock_price = self.stock_prices(step)
+                np.maximum(call_price, stock_price - K, out=call_price)
+                np.maximum(put_price, K - stock_price, out=put_price)
+
+        return call_price[..., 0][()], put_price[..., 0][()]
+
+    def get_european_option(self):
+        return self._rollback(american=False)
 
-        return call_price[0], put_price[0]
\ No newline at end of file
+    def get_american_option(self):
+        return self._rollback(american=True)
@@ -0,0 +1,231 @@
+import argparse
+import inspect
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from option_class.batch import price_rows
+from option_class.grid import MODELS
+from option_class.parallel import resolve_workers
+
+# Pricing d'un book d'options en flux, depuis un fichier de positions CSV ou Parquet
+#     python -m option_class.book positions.csv prix.parquet --chunk-size 20000 --workers 4
+# Chaque ligne du fichier est une option : une colonne model (clé de MODELS, ou --model pour tout le fichier) et une
+# colonne par argument du constructeur du pricer (S, K, T, r, sigma, kappa, ..., method, num_simulations, seed).
+# Les cellules vides sont ignorées (le pricer prend sa valeur par défaut) : un même fichier peut mêler les modèles.
+# Les autres colonnes (identifiant de position, quantité...) sont recopiées telles quelles dans le fichier de sortie,
+# complétées des colonnes call, put et error (message des lignes qui n'ont pas pu être pricées).
+# Le fichier est lu par paquets de chunk_size lignes ; chaque paquet est regroupé par modèle et pricé par les chemins
+# vectorisés (option_class.batch), éventuellement sur un pool de processus, puis écrit à la suite du fichier de sortie.
+# La mémoire reste bornée par quelques paquets quelle que soit la taille du book ; le débit (lignes/s) est affiché
+# sur la sortie d'erreur après chaque paquet.
+# Le format est déduit de l'extension (.parquet ou .pq pour Parquet, sinon CSV, compressé selon l'extension).
+# En Parquet, le schéma est fixé au premier paquet et ne dépend pas de son contenu pour les colonnes connues
+# (paramètres textuels en chaînes, paramètres numériques, call et put en float64, error en chaîne) ; les autres
+# colonnes prennent des types nullables (entiers Int64, textes et colonnes vides du premier paquet en chaînes).
+
+PRICE_COLUMNS = ('call', 'put', 'error')
+# Paramètres entiers, relus en float par pandas dans les colonnes qui contiennent des cellules vides
+INTEGER_PARAMS = ('steps', 'num_simulations', 'num_steps', 'num_nodes', 'num_replicates', 'num_space', 'batch_size',
+                  'seed', 'N')
+# Colonnes textuelles du fichier de sortie ; les autres paramètres des pricers sont numériques
+STRING_COLUMNS = ('model', 'method', 'sampling', 'variance_reduction', 'error')
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path, chunk_size=10000):
+    """DataFrames successifs d'au plus chunk_size lignes du fichier de positions (CSV ou Parquet)."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _constructor_params(model):
+    return [name for name in inspect.signature(MODELS[model]).parameters if name != 'workers']
+
+
+def _numeric_columns():
+    names = {'call', 'put'}
+    for model in MODELS:
+        names.update(_constructor_params(model))
+    return names.difference(STRING_COLUMNS + ('S_grid', 't_grid'))
+
+
+def _typed_frame(frame):
+    """Copie de frame aux types fixes du fichier Parquet (indépendants des valeurs présentes dans le paquet)."""
+    frame = frame.copy()
+    numeric = _numeric_columns()
+    for name, column in frame.items():
+        if name in STRING_COLUMNS:
+            frame[name] = column.astype('string')
+        elif name in numeric:
+            frame[name] = pd.to_numeric(column, errors='coerce').astype('float64')
+        elif pd.api.types.is_bool_dtype(column):
+            frame[name] = column.astype('boolean')
+        elif pd.api.types.is_integer_dtype(column):
+            frame[name] = column.astype('Int64')
+        elif column.dtype == object:
+            frame[name] = column.astype('string')
+    return frame
+
+
+def _row_params(record, names):
+    """Paramètres du pricer lus dans une ligne : cellules non vides des colonnes du constructeur."""
+    params = {}
+    for name in names:
+        value = record.get(name)
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        if name in INTEGER_PARAMS and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        params[name] = value
+    return params
+
+
+def price_frame(frame, model=None):
+    """Copie de frame complétée des colonnes call, put et error, les lignes étant regroupées par modèle.
+
+    model : modèle des lignes dont la colonne model est absente ou vide.
+    """
+    n = len(frame)
+    if 'model' in frame.columns:
+        column = frame['model'] if model is None else frame['model'].fillna(model)
+        models = column.astype(str).str.strip().str.upper().to_numpy()
+    elif model is not None:
+        models = np.full(n, model.upper(), dtype=object)
+    else:
+        raise ValueError("Positions need a 'model' column, or a model for the whole file")
+
+    call_prices = np.full(n, np.nan)
+    put_prices = np.full(n, np.nan)
+    errors = np.full(n, None, dtype=object)
+    for name in pd.unique(models):
+        indices = np.flatnonzero(models == name)
+        if name not in MODELS:
+            errors[indices] = "Unknown model: %s" % name
+            continue
+        names = [column for column in _constructor_params(name) if column in frame.columns]
+        records = frame.iloc[indices][names].to_dict('records')
+        call, put, _, row_errors = price_rows(name, [_row_params(record, names) for record in records])
+        call_prices[indices], put_prices[indices] = call, put
+        errors[indices] = row_errors
+
+    result = frame.drop(columns=[column for column in PRICE_COLUMNS if column in frame.columns])
+    result['call'] = call_prices
+    result['put'] = put_prices
+    result['error'] = pd.array(errors, dtype='string')
+    return result
+
+
+def _priced_chunks(chunks, model, workers):
+    """Paquets pricés dans l'ordre de lecture ; en parallèle, au plus 2 paquets en cours par processus."""
+    if workers == 1:
+        for chunk in chunks:
+            yield price_frame(chunk, model)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(price_frame, chunk, model))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class Book_writer:
+    """Écriture incrémentale des paquets pricés dans un fichier CSV ou Parquet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = _is_parquet(path)
+        self.writer = None   # ParquetWriter, ouvert au premier paquet (schéma)
+        self.started = False
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(_typed_frame(frame), preserve_index=False)
+            if self.writer is None:
+                # Colonne inconnue vide dans le premier paquet : chaîne, le seul type vers lequel tout se convertit
+                known = _numeric_columns().union(STRING_COLUMNS)
+                empty = [name for name in table.column_names
+                         if name not in known and table.column(name).null_count == table.num_rows]
+                schema = pa.schema([pa.field(field.name, pa.string()) if field.name in empty else field
+                                    for field in table.schema], metadata=table.schema.metadata)
+                self.writer = pq.ParquetWriter(self.path, schema)
+            try:
+                table = table.cast(self.writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError("A column changes type after the first chunk of %s: %s" % (self.path, e)) from e
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self.started else 'w', header=not self.started, index=False)
+        self.started = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def price_book(input_path, output_path, model=None, chunk_size=10000, workers=None, progress=True):
+    """Price le book de input_path par paquets et écrit les prix dans output_path.
+
+    workers : nombre de processus (None ou 1 en série, -1 pour tous les coeurs).
+    Renvoie le nombre de lignes, le nombre de lignes en erreur et la durée (s).
+    """
+    workers = resolve_workers(workers)
+    start = time.perf_counter()
+    rows = failed = 0
+    with Book_writer(output_path) as writer:
+        for frame in _priced_chunks(read_chunks(input_path, chunk_size), model, workers):
+            writer.write(frame)
+            rows += len(frame)
+            failed += int(frame['error'].notna().sum())
+            if progress:
+                elapsed = time.perf_counter() - start
+                print("%d rows priced (%d errors), %.0f rows/s" % (rows, failed, rows / elapsed),
+                      file=sys.stderr, flush=True)
+    return rows, failed, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m option_class.book',
+                                     description="Price a book of options from a CSV or Parquet positions file.")
+    parser.add_argument('input', help="positions file (.csv, .csv.gz, .parquet)")
+    parser.add_argument('output', help="priced file (.csv, .csv.gz, .parquet)")
+    parser.add_argument('--model', choices=sorted(MODELS), type=str.upper,
+                        help="model of the rows without a 'model' value")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows read and priced at a time")
+    parser.add_argument('--workers', type=int, default=None, help="pricing processes (-1: all cores)")
+    parser.add_argument('--quiet', action='store_true', help="do not report progress")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be positive")
+
+    rows, failed, elapsed = price_book(args.input, args.output, args.model, args.chunk_size, args.workers,
+                                       progress=not args.quiet)
+    print("Done: %d rows in %.1f s (%.0f rows/s), %d errors"
+          % (rows, elapsed, rows / elapsed if elapsed else 0.0, failed), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
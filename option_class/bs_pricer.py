@@ -5,6 +5,8 @@ from scipy.stats import norm
 # Utilisé pour les options européennes où la volatilité est supposée constante dans le temps.
 # Très utilisé pour des options standards sur actions, indices ou devises, en raison de sa simplicité et de sa formule fermée.
 # Il assume une volatilité constante et une dynamique du sous-jacent suivant un mouvement brownien géométrique.
+# Tous les paramètres acceptent des scalaires ou des tableaux NumPy, combinés par broadcasting :
+# une chaîne d'options ou une surface complète se price en un seul appel vectorisé.
 
 class BS_pricer:
     def __init__(self, S, K, T, r, sigma):
@@ -14,16 +16,66 @@ class BS_pricer:
         self.r = r          # Taux sans risque
         self.sigma = sigma  # Volatilité
 
+    @staticmethod
+    def get_BS_parameter(S, K, T, r, sigma):
+        """Calcule d1 et d2 par broadcasting des entrées (scalaires ou tableaux)."""
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)))
+        vol_sqrt_T = sigma * np.sqrt(T)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / vol_sqrt_T
+        d2 = d1 - vol_sqrt_T
+        return d1, d2
+
+    @staticmethod
+    def price(S, K, T, r, sigma):
+        """Prix Call et Put européens pour des entrées broadcastables.
+
+        Les cellules où sigma <= 0 ou T <= 0 valent NaN. Des entrées scalaires renvoient des scalaires.
+        """
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)))
+        d1, d2 = BS_pricer.get_BS_parameter(S, K, T, r, sigma)
+        discount_K = K * np.exp(-r * T)
+        call_price = S * norm.cdf(d1) - discount_K * norm.cdf(d2)
+        put_price = discount_K * norm.cdf(-d2) - S * norm.cdf(-d1)
+        invalid = (sigma <= 0) | (T <= 0)
+        if np.any(invalid):
+            call_price = np.where(invalid, np.nan, call_price)
+            put_price = np.where(invalid, np.nan, put_price)
+        return call_price[()], put_price[()]
+
+    @staticmethod
+    def greeks(S, K, T, r, sigma):
+        """Grecques fermées (delta, gamma, vega, theta) du Call et du Put, par broadcasting des entrées."""
+        S, K, T, r, sigma = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (S, K, T, r, sigma)))
+        d1, d2 = BS_pricer.get_BS_parameter(S, K, T, r, sigma)
+        pdf_d1 = norm.pdf(d1)
+        discount_K = K * np.exp(-r * T)
+        gamma = pdf_d1 / (S * sigma * np.sqrt(T))
+        vega = S * pdf_d1 * np.sqrt(T)
+        time_decay = -S * pdf_d1 * sigma / (2 * np.sqrt(T))
+        call_greeks = {
+            'delta': norm.cdf(d1)[()],
+            'gamma': gamma[()],
+            'vega': vega[()],
+            'theta': (time_decay - r * discount_K * norm.cdf(d2))[()],
+        }
+        put_greeks = {
+            'delta': (norm.cdf(d1) - 1)[()],
+            'gamma': gamma[()],
+            'vega': vega[()],
+            'theta': (time_decay + r * discount_K * norm.cdf(-d2))[()],
+        }
+        return call_greeks, put_greeks
+
     def get_european_option(self):
-        d1 = (np.log(self.S / self.K) + (self.r + 0.5 * self.sigma**2) * self.T) / (self.sigma * np.sqrt(self.T))
-        d2 = d1 - self.sigma * np.sqrt(self.T)
-        call_price = self.S * norm.cdf(d1) - self.K * np.exp(-self.r * self.T) * norm.cdf(d2)
-        put_price = self.K * np.exp(-self.r * self.T) * norm.cdf(-d2) - self.S * norm.cdf(-d1)
-        return call_price, put_price
+        return BS_pricer.price(self.S, self.K, self.T, self.r, self.sigma)
+
+    def get_greeks(self):
+        return BS_pricer.greeks(self.S, self.K, self.T, self.r, self.sigma)
 
     def get_asian_option(self):
         sigma_adj = self.sigma / np.sqrt(3)
-        r_adj = 0.5 * (self.r - 0.5 * self.sigma^2) + 0.5 * ((self.sigma^2) / 3)
+        r_adj = 0.5 * (self.r - 0.5 * self.sigma**2) + 0.5 * ((self.sigma**2) / 3)
 
         d1, d2 = BS_pricer.get_BS_parameter(self.S, self.K, self.T, r_adj, sigma_adj)
 
@@ -32,4 +84,4 @@ class BS_pricer:
 
         put_price = (self.K * np.exp(-r_adj * self.T) * norm.cdf(-d2)
                      - self.S * np.exp(-r_adj * self.T) * norm.cdf(-d1))
-        return call_price, put_price
+        return call_price[()], put_price[()]
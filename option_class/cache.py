@@ -0,0 +1,225 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+# Cache des prix calculés, partagé par toutes les requêtes de l'application
+# Clé : nom du modèle + paramètres normalisés (nombres en float, tableaux en tuples, autres objets par empreinte
+# de leur pickle), graine incluse : deux requêtes de mêmes paramètres et même graine donnent le même prix.
+# Un Monte Carlo sans graine n'est pas mis en cache (grid.random_pricing) : chaque pricing est un nouveau tirage.
+# Les paramètres non picklables (surface de volatilité définie par une lambda) rendent le pricing non cachable.
+# Taille bornée avec éviction LRU et durée de vie optionnelle (ttl, en secondes).
+# Par défaut le cache est en mémoire (propre au processus) ; avec path, les entrées sont stockées dans une base SQLite
+# locale partagée entre processus (workers gunicorn), l'éviction LRU se faisant sur la date du dernier accès.
+# En SQLite, une lecture n'écrit rien : les dates d'accès sont gardées en mémoire et écrites par paquets (avec
+# l'écriture suivante, ou tous les TOUCH_BATCH_SIZE accès). Le nombre d'entrées n'est contrôlé que tous les
+# max_size / 100 ajouts du processus, et l'éviction ne s'exécute que si la base dépasse max_size.
+
+TOUCH_BATCH_SIZE = 256  # Dates d'accès SQLite en attente avant écriture
+
+
+def _normalize(value):
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_normalize(x) for x in np.asarray(value, dtype=object).ravel()), np.shape(value)
+    return hashlib.sha256(pickle.dumps(value)).hexdigest()
+
+
+def cache_key(model, params):
+    """Clé du pricing de model avec params, ou None si un paramètre ne peut pas être normalisé."""
+    try:
+        normalized = tuple(sorted((name, _normalize(value)) for name, value in params.items()))
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return None
+    return hashlib.sha256(repr((model, normalized)).encode()).hexdigest()
+
+
+class _Memory_store:
+    def __init__(self):
+        self.entries = OrderedDict()  # clé -> (date de création, valeur), du moins au plus récemment utilisé
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key, created, value):
+        self.entries[key] = (created, value)
+        self.entries.move_to_end(key)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+    def transaction(self):
+        return nullcontext()
+
+    def evict(self, max_size):
+        evicted = max(len(self.entries) - max_size, 0)
+        for _ in range(evicted):
+            self.entries.popitem(last=False)
+        return evicted
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class _Sqlite_store:
+    def __init__(self, path):
+        self.path = path
+        self.pid = None
+        self.touched = {}   # clé -> date du dernier accès, pas encore écrite
+        self.unchecked = 0  # Ajouts depuis le dernier contrôle du nombre d'entrées
+
+    @property
+    def connection(self):
+        # Une connexion par processus : les workers gunicorn forkés n'héritent pas de celle du parent
+        if self.pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                               isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS prices "
+                                     "(key TEXT PRIMARY KEY, created REAL, accessed REAL, value BLOB)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS prices_accessed ON prices (accessed)")
+            self.pid = os.getpid()
+            self.touched = {}
+            self.unchecked = 0
+        return self._connection
+
+    def get(self, key):
+        row = self.connection.execute("SELECT created, value FROM prices WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.touched[key] = time.time()
+        if len(self.touched) >= TOUCH_BATCH_SIZE:
+            with self.transaction():
+                pass  # La transaction écrit les dates d'accès en attente
+        return row[0], pickle.loads(row[1])
+
+    def set(self, key, created, value):
+        self.touched.pop(key, None)
+        self.connection.execute("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)",
+                                (key, created, time.time(), pickle.dumps(value)))
+        self.unchecked += 1
+
+    def delete(self, key):
+        self.touched.pop(key, None)
+        self.connection.execute("DELETE FROM prices WHERE key = ?", (key,))
+
+    @contextmanager
+    def transaction(self):
+        """Transaction d'écriture, qui commence par écrire les dates d'accès en attente."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.touched:
+                self.connection.executemany("UPDATE prices SET accessed = ? WHERE key = ?",
+                                            [(accessed, key) for key, accessed in self.touched.items()])
+                self.touched = {}
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def evict(self, max_size):
+        # Contrôle amorti : la base peut dépasser max_size d'au plus 1 % par processus entre deux contrôles
+        if self.unchecked < max(1, max_size // 100):
+            return 0
+        self.unchecked = 0
+        if len(self) <= max_size:
+            return 0
+        cursor = self.connection.execute(
+            "DELETE FROM prices WHERE key IN (SELECT key FROM prices ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (max_size,))
+        return cursor.rowcount
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+    def clear(self):
+        self.touched = {}
+        self.connection.execute("DELETE FROM prices")
+
+
+class Price_cache:
+    def __init__(self, max_size=100000, ttl=None, path=None):
+        self.max_size = max_size  # Nombre maximal d'entrées (éviction des moins récemment utilisées)
+        self.ttl = ttl            # Durée de vie d'une entrée en secondes (None : illimitée)
+        self.path = path          # Fichier SQLite partagé entre processus (None : cache en mémoire)
+        self.store = _Memory_store() if path is None else _Sqlite_store(path)
+        self.lock = threading.Lock()
+        # Compteurs propres au processus
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Valeur associée à key, ou None (clé absente, expirée ou None)."""
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.store.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+                self.store.delete(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        """Ajoute les paires (clé, valeur) en une seule écriture, suivie d'une seule passe d'éviction."""
+        items = [(key, value) for key, value in items if key is not None]
+        if not items:
+            return
+        with self.lock:
+            created = time.time()
+            with self.store.transaction():
+                for key, value in items:
+                    self.store.set(key, created, value)
+                self.evictions += self.store.evict(self.max_size)
+
+    def get_or_compute(self, model, params, function):
+        """function() mis en cache sous la clé (model, params), recalculé à chaque appel si elle n'existe pas."""
+        key = cache_key(model, params)
+        value = self.get(key)
+        if value is None:
+            value = function()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.store.clear()
+
+    def stats(self):
+        """Compteurs de succès, d'échecs, d'évictions et d'expirations, taille et taux de succès."""
+        with self.lock:
+            size = len(self.store)
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': size,
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
@@ -1,39 +1,144 @@
 import numpy as np
-from scipy.interpolate import interp2d
+
+from option_class.monte_carlo import (check_sampling, finite_difference_greeks, monte_carlo_price, parse_variance_reduction,
+                                      seed_sequence, standard_normal, stream)
+from option_class.pde_pricer import PDE_pricer
 
 # Modèle de Local Volatility (Dupire)
 # Utilisé pour ajuster la surface de volatilité implicite observée sur le marché. La volatilité est modélisée comme une fonction du sous-jacent et du temps.
 # Utilisé pour des options exotiques ou pour modéliser la dynamique de volatilité en fonction du prix et du temps.
+# La surface est évaluée sur toutes les trajectoires à la fois (appel vectorisé), ou tabulée une fois sur une grille (S, t)
+# puis lue par interpolation bilinéaire.
+# Avec method='pde', le prix est la solution de l'EDP de Crank-Nicolson (PDE_pricer) : une résolution pour tous les spots,
+# options américaines comprises.
+
+
+def bilinear_interpolate(x_grid, y_grid, table, x, y):
+    """Interpolation bilinéaire de table[j, i] = f(x_grid[i], y_grid[j]), extrapolation plate hors de la grille."""
+    x = np.clip(x, x_grid[0], x_grid[-1])
+    y = np.clip(y, y_grid[0], y_grid[-1])
+    i = np.clip(np.searchsorted(x_grid, x, side='right') - 1, 0, len(x_grid) - 2)
+    j = np.clip(np.searchsorted(y_grid, y, side='right') - 1, 0, len(y_grid) - 2)
+    wx = (x - x_grid[i]) / (x_grid[i + 1] - x_grid[i])
+    wy = (y - y_grid[j]) / (y_grid[j + 1] - y_grid[j])
+    return ((1 - wy) * ((1 - wx) * table[j, i] + wx * table[j, i + 1])
+            + wy * ((1 - wx) * table[j + 1, i] + wx * table[j + 1, i + 1]))
+
 
 class Dupire_pricer:
-    def __init__(self, S, K, T, r, local_vol_surface, num_simulations=10000, num_steps=100):
+    num_factors = 1  # Browniens simulés par pas de temps
+    scale_invariant = False  # La volatilité locale dépend de S : S_T n'est pas proportionnel à S_0
+
+    def __init__(self, S, K, T, r, local_vol_surface, num_simulations=10000, num_steps=100,
+                 S_grid=None, t_grid=None, batch_size=None, vol_shift=0.0, variance_reduction=None, sampling='pseudo',
+                 num_replicates=8, seed=None, workers=None,
+                 target_std_error=None, method='mc', num_space=800):
         self.S = S  # Prix de l'actif sous-jacent
         self.K = K  # Prix d'exercice
         self.T = T  # Maturité
         self.r = r  # Taux sans risque
-        self.local_vol_surface = local_vol_surface  # Surface de volatilité locale
+        self.local_vol_surface = local_vol_surface  # Surface de volatilité locale appelée sur des tableaux, ou constante
         self.num_simulations = num_simulations  # Nombre de simulations Monte Carlo
         self.num_steps = num_steps  # Nombre de pas dans les simulations
+        self.batch_size = batch_size  # Nombre maximal de trajectoires simulées à la fois
+        self.vol_shift = vol_shift  # Décalage parallèle de la surface (sert au calcul de vega)
+        self.variance_reduction = parse_variance_reduction(variance_reduction)  # Techniques de réduction de variance
+        self.sampling = check_sampling(sampling, self.variance_reduction, num_replicates)  # 'pseudo' ou 'sobol'
+        self.num_replicates = num_replicates  # Nombre de brouillages indépendants en Sobol (estimation de l'erreur)
+        self.seed_sequence = seed_sequence(seed)  # Graine des flux aléatoires (entier, SeedSequence ou Generator)
+        self.workers = workers  # Processus utilisés pour simuler les lots (None : série, -1 : tous les coeurs)
+        self.target_std_error = target_std_error  # Erreur standard visée (arrêt adaptatif)
+        self.std_errors = None  # Erreurs standard Call et Put du dernier pricing Monte Carlo
+        self.num_paths = None  # Trajectoires simulées lors du dernier pricing Monte Carlo
+        if method not in ('mc', 'pde'):
+            raise ValueError("Method must be 'mc' or 'pde'")
+        self.method = method  # Méthode de pricing : Monte Carlo ou EDP de Crank-Nicolson (num_steps pas de temps)
+        self.num_space = num_space  # Nombre de points de la grille en S de l'EDP
+        self.vol_table = None
+        if (S_grid is None) != (t_grid is None):
+            raise ValueError("S_grid and t_grid must be given together")
+        if S_grid is not None:
+            self.tabulate(S_grid, t_grid)
+
+    def tabulate(self, S_grid, t_grid):
+        """Évalue la surface une seule fois sur la grille (S, t) ; les lectures suivantes sont bilinéaires."""
+        self.S_grid = np.asarray(S_grid, dtype=float)
+        self.t_grid = np.asarray(t_grid, dtype=float)
+        if len(self.S_grid) < 2 or len(self.t_grid) < 2:
+            raise ValueError("S_grid and t_grid need at least two points each")
+        S_mesh, t_mesh = np.meshgrid(self.S_grid, self.t_grid)
+        self.vol_table = np.broadcast_to(self._surface(S_mesh, t_mesh), S_mesh.shape).astype(float)
+
+    def _surface(self, S, t):
+        if callable(self.local_vol_surface):
+            return self.local_vol_surface(S, t)
+        return float(self.local_vol_surface)  # Volatilité constante (surface plate)
 
     def local_vol(self, S, t):
-        return self.local_vol_surface(S, t)  # Utilise la surface de volatilité locale
+        if self.vol_table is not None:
+            if np.ndim(t) == 0:
+                # t commun à toutes les trajectoires : une ligne interpolée en temps, puis np.interp en S
+                vol_row = bilinear_interpolate(self.S_grid, self.t_grid, self.vol_table, self.S_grid, t)
+                return np.interp(S, self.S_grid, vol_row)
+            return bilinear_interpolate(self.S_grid, self.t_grid, self.vol_table, S, t)
+        return np.broadcast_to(self._surface(S, t), np.shape(S))  # Utilise la surface de volatilité locale
 
-    def get_european_option(self):
-        dt = self.T / self.num_steps
-        S_paths = np.zeros((self.num_steps + 1, self.num_simulations))
-        S_paths[0] = self.S
+    def simulate_terminal(self, n, rng=None, with_control=False, Z=None):
+        """Simule n valeurs terminales en avançant toutes les trajectoires d'un pas de temps à la fois.
 
+        Avec with_control=True, renvoie aussi un sous-jacent Black-Scholes (control_parameters) sur les mêmes browniens.
+        Z (1, num_steps, n) fournit les gaussiennes à utiliser (quasi Monte Carlo) ; sinon elles sont tirées par rng
+        (par défaut le premier flux du pricer).
+        """
+        rng = stream(self) if rng is None and Z is None else rng
+        dt = self.T / self.num_steps
+        S_t = np.full(n, self.S, dtype=float)
+        if with_control:
+            control_drift, control_vol = self.control_parameters()
+            control_log_return = np.zeros(n)
         for t in range(1, self.num_steps + 1):
-            for i in range(self.num_simulations):
-                vol = self.local_vol(S_paths[t - 1, i], t * dt)
-                dW = np.random.normal(0, np.sqrt(dt))
-                S_paths[t, i] = S_paths[t - 1, i] * np.exp((self.r - 0.5 * vol**2) * dt + vol * dW)
+            vol = self.local_vol(S_t, t * dt) + self.vol_shift
+            dW = np.sqrt(dt) * (standard_normal(rng, n, self.variance_reduction) if Z is None else Z[0, t - 1])
+            S_t = S_t * np.exp((self.r - 0.5 * vol**2) * dt + vol * dW)
+            if with_control:
+                control_log_return += (control_drift - 0.5 * control_vol**2) * dt + control_vol * dW
+        if with_control:
+            return S_t, self.S * np.exp(control_log_return)
+        return S_t
+
+    def expected_terminal(self):
+        """E[S_T] = S_0 exp(rT), espérance de la variable de contrôle S_T."""
+        return self.S * np.exp(self.r * self.T)
+
+    def control_parameters(self):
+        """Dérive et volatilité du sous-jacent Black-Scholes de contrôle : volatilité locale en (S_0, 0)."""
+        return self.r, float(self.local_vol(np.asarray(self.S, dtype=float), 0.0)) + self.vol_shift
+
+    def pde_pricer(self):
+        """Moteur EDP sur la surface (décalée de vol_shift) ; S peut être un tableau de spots, pricés en une résolution."""
+        return PDE_pricer(lambda S, t: self.local_vol(S, t) + self.vol_shift, self.S, self.K, self.T, self.r,
+                          num_space=self.num_space, num_time=self.num_steps)
+
+    def get_european_option(self):
+        if self.method == 'pde':
+            return self.pde_pricer().get_european_option()
+        return monte_carlo_price(self)
 
-        S_T = S_paths[-1]
-        call_payoff = np.maximum(S_T - self.K, 0)
-        put_payoff = np.maximum(self.K - S_T, 0)
+    def get_american_option(self):
+        """Prix Call et Put américains, par l'EDP avec pénalisation de l'exercice anticipé."""
+        if self.method != 'pde':
+            raise ValueError("American options need method='pde'")
+        return self.pde_pricer().get_american_option()
 
-        call_price = np.exp(-self.r * self.T) * np.mean(call_payoff)
-        put_price = np.exp(-self.r * self.T) * np.mean(put_payoff)
+    def get_greeks(self):
+        """Grecques Call et Put (delta, gamma, vega pour un décalage parallèle de la surface, theta).
 
-        return call_price, put_price
\ No newline at end of file
+        La volatilité locale dépend de S : pas d'estimateur pathwise par changement d'échelle, toutes les grecques
+        sont des différences centrées qui rejouent les mêmes tirages aléatoires. En EDP, delta et gamma sont lus
+        sur la grille de la solution.
+        """
+        if self.method == 'pde':
+            call_greeks, put_greeks = self.pde_pricer().get_greeks()
+            delta_gamma = ([call_greeks['delta'], put_greeks['delta']], [call_greeks['gamma'], put_greeks['gamma']])
+            return finite_difference_greeks(self, 'vol_shift', delta_gamma=delta_gamma)
+        return finite_difference_greeks(self, 'vol_shift')
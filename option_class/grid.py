@@ -0,0 +1,166 @@
+import numpy as np
+
+from option_class.binomial_pricer import Binomial_pricer
+from option_class.bs_pricer import BS_pricer
+from option_class.cache import cache_key
+from option_class.dupire_pricer import Dupire_pricer
+from option_class.heston_pricer import Heston_pricer
+from option_class.merton_pricer import Merton_pricer
+from option_class.monte_carlo import scaled_prices
+from option_class.sabr_pricer import SABR_pricer
+from option_class.vg_pricer import VG_pricer
+
+# Pricing d'une grille de paramètres (heatmaps et surfaces 3D)
+# Chaque modèle est pricé par le chemin le plus groupé qu'il accepte :
+# - Black-Scholes : toute la grille en un seul appel vectorisé ;
+# - formules vectorisées (arbre binomial, SABR, série de Merton, quadrature de Heston, FFT, EDP de Dupire) :
+#   un appel par ligne (ou par colonne) le long de l'axe que le pricer accepte sous forme de tableau ;
+# - Monte Carlo des modèles où S_T est proportionnel à S_0 : une simulation par ligne, remise à l'échelle pour tous
+#   les spots ou strikes de la ligne (scaled_prices) ;
+# - sinon, un pricing par case.
+# Les cases dont les paramètres sont refusés par le pricer valent NaN.
+# iter_price_grid rend la grille après chaque ligne pricée (affichage progressif, interruption entre deux lignes).
+
+MODELS = {
+    'BS': BS_pricer,
+    'BINOMIAL': Binomial_pricer,
+    'SABR': SABR_pricer,
+    'HESTON': Heston_pricer,
+    'MERTON': Merton_pricer,
+    'VG': VG_pricer,
+    'DUPIRE': Dupire_pricer,
+}
+
+# Paramètres acceptés sous forme de tableau par chaque modèle, selon sa méthode de pricing
+VECTOR_PARAMS = {
+    'BS': {None: ('S', 'K', 'T', 'r', 'sigma')},
+    'BINOMIAL': {None: ('S', 'K')},
+    'SABR': {None: ('S', 'K', 'T')},
+    'HESTON': {'mc': ('S', 'K'), 'quad': ('S', 'K'), 'fft': ('K',)},
+    'MERTON': {'mc': ('S', 'K'), 'analytic': ('S', 'K'), 'fft': ('K',)},
+    'VG': {'mc': ('S', 'K'), 'fft': ('K',)},
+    'DUPIRE': {'mc': (), 'pde': ('S', 'K')},
+}
+
+
+def create_pricer(model, params):
+    """Instancie le pricer du modèle (clé de MODELS) avec les paramètres de son constructeur."""
+    if model not in MODELS:
+        raise ValueError("Unknown model: %s" % model)
+    return MODELS[model](**params)
+
+
+def random_pricing(model, params):
+    """Vrai pour un Monte Carlo sans graine : chaque pricing est un tirage différent, à ne pas mettre en cache."""
+    return 'mc' in VECTOR_PARAMS.get(model, {}) and params.get('method', 'mc') == 'mc' and params.get('seed') is None
+
+
+def vector_params(model, params):
+    """Paramètres que le modèle, avec sa méthode de pricing, price en un seul appel pour un tableau de valeurs."""
+    by_method = VECTOR_PARAMS[model]
+    return by_method.get(params.get('method', 'mc'), by_method.get(None, ()))
+
+
+def price_arrays(model, params, arrays):
+    """Prix Call et Put quand les paramètres de arrays (parmi vector_params) parcourent des tableaux, en un appel.
+
+    Les tableaux sont combinés élément par élément (broadcasting) ; les autres paramètres sont ceux de params.
+    """
+    if params.get('method', 'mc') == 'mc' and getattr(MODELS[model], 'scale_invariant', False):
+        return scaled_prices(create_pricer(model, params), **arrays)
+    return create_pricer(model, dict(params, **arrays)).get_european_option()
+
+
+def _price_point(model, params):
+    return create_pricer(model, params).get_european_option()
+
+
+def _price_line(model, params, name, values):
+    """Prix le long d'un axe (price_arrays) ; si le pricer refuse le tableau, les valeurs sont pricées une à une."""
+    try:
+        return price_arrays(model, params, {name: values})
+    except (ValueError, ArithmeticError):
+        prices = np.full((2, len(values)), np.nan)
+        for k, value in enumerate(values):
+            _fill(prices[0], prices[1], k, _price_point, model, dict(params, **{name: value}))
+        return prices
+
+
+def _fill(call_prices, put_prices, index, function, *args):
+    try:
+        call_prices[index], put_prices[index] = function(*args)
+    except (ValueError, ArithmeticError):
+        pass  # Paramètres refusés par le pricer : la case reste à NaN
+
+
+def iter_price_grid(model, base_params, x_param, x_values, y_param, y_values, cache=None):
+    """Version progressive de price_grid : produit (call_prices, put_prices, pending) après chaque ligne pricée.
+
+    Les tableaux sont remplis sur place ; pending indique les cases pas encore pricées (NaN en attendant).
+    Le premier résultat contient les cases lues dans le cache. Chaque ligne est ajoutée au cache dès qu'elle est
+    pricée : interrompre l'itération ne perd aucun calcul terminé. Un Monte Carlo sans graine n'utilise pas le cache.
+    """
+    if model not in MODELS:
+        raise ValueError("Unknown model: %s" % model)
+    if random_pricing(model, base_params):
+        cache = None
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    shape = (len(y_values), len(x_values))
+    call_prices = np.full(shape, np.nan)
+    put_prices = np.full(shape, np.nan)
+    pending = np.ones(shape, dtype=bool)  # Cases à pricer
+    if cache is not None:
+        keys = np.empty(shape, dtype=object)
+        for i, j in np.ndindex(shape):
+            keys[i, j] = cache_key(model, dict(base_params, **{x_param: x_values[j], y_param: y_values[i]}))
+            cached = cache.get(keys[i, j])
+            if cached is not None:
+                call_prices[i, j], put_prices[i, j] = cached
+                pending[i, j] = False
+    yield call_prices, put_prices, pending
+
+    for line in _grid_lines(model, base_params, x_param, x_values, y_param, y_values, pending):
+        rows, columns = np.nonzero(line)
+        if model == 'BS':
+            params = dict(base_params, **{x_param: x_values[columns], y_param: y_values[rows]})
+            call_prices[line], put_prices[line] = BS_pricer.price(params['S'], params['K'], params['T'], params['r'],
+                                                                  params['sigma'])
+        elif x_param in vector_params(model, base_params):
+            _fill(call_prices, put_prices, line, _price_line, model,
+                  dict(base_params, **{y_param: y_values[rows[0]]}), x_param, x_values[columns])
+        elif y_param in vector_params(model, base_params):
+            _fill(call_prices, put_prices, line, _price_line, model,
+                  dict(base_params, **{x_param: x_values[columns[0]]}), y_param, y_values[rows])
+        else:
+            for i, j in zip(rows, columns):
+                _fill(call_prices, put_prices, (i, j), _price_point, model,
+                      dict(base_params, **{x_param: x_values[j], y_param: y_values[i]}))
+        pending[line] = False
+        if cache is not None:
+            cache.set_many((keys[i, j], (float(call_prices[i, j]), float(put_prices[i, j])))
+                           for i, j in zip(rows, columns))
+        yield call_prices, put_prices, pending
+
+
+def _grid_lines(model, base_params, x_param, x_values, y_param, y_values, pending):
+    """Masques des cases pricées ensemble : toute la grille (BS), des lignes ou des colonnes (axe vectorisé)."""
+    if model == 'BS':
+        lines = [pending.copy()]
+    elif y_param in vector_params(model, base_params) and x_param not in vector_params(model, base_params):
+        lines = [pending & (np.arange(len(x_values)) == j) for j in range(len(x_values))]
+    else:
+        lines = [pending & (np.arange(len(y_values)) == i)[:, np.newaxis] for i in range(len(y_values))]
+    return [line for line in lines if line.any()]
+
+
+def price_grid(model, base_params, x_param, x_values, y_param, y_values, cache=None):
+    """Prix Call et Put sur la grille np.meshgrid(x_values, y_values) : tableaux (len(y_values), len(x_values)).
+
+    base_params contient les arguments du constructeur du pricer (paramètres du modèle et options de pricing) ;
+    x_param et y_param en sont remplacés case par case. Avec cache (Price_cache), chaque case est cherchée dans le cache
+    et seules les cases absentes sont pricées, puis ajoutées au cache.
+    """
+    for call_prices, put_prices, _ in iter_price_grid(model, base_params, x_param, x_values, y_param, y_values, cache):
+        pass
+    return call_prices, put_prices
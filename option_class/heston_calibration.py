@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from option_class.heston_pricer import (_legendre_nodes, heston_characteristic_function, heston_integration_bound,
+                                        quadrature_size)
+
+# Calibration du modèle de Heston sur une surface de prix d'options
+# Les cotations sont pricées par la formule semi-analytique de Heston_pricer en méthode 'quad', une passe vectorisée
+# par maturité distincte. La borne d'intégration est celle du pricer (heston_integration_bound, qui dépend de la
+# maturité et des paramètres) arrondie à la puissance de 2 supérieure : les noeuds de quadrature et les noyaux
+# exp(-iu ln(K/S)) / (iu) d'une maturité sont calculés une fois par borne arrondie et mis en cache ; d'une itération
+# à l'autre, seule la fonction caractéristique est réévaluée. Les maturités courtes, dont l'intégrande décroît
+# lentement, ont ainsi une grille plus longue, et la calibration ajuste le modèle que le pricer évalue.
+# Chaque calibration repart de la précédente (warm start) et enregistre son nombre d'itérations et son temps de calcul.
+
+PARAMETER_NAMES = ('kappa', 'theta', 'xi', 'rho', 'v0')
+
+
+class Heston_calibrator:
+    lower_bounds = (1e-4, 1e-4, 1e-4, -0.999, 1e-4)
+    upper_bounds = (20.0, 2.0, 5.0, 0.999, 2.0)
+
+    def __init__(self, S, r, strikes, maturities, market_prices, is_call=True, weights=None,
+                 num_nodes=128, tol=1e-10):
+        self.S = S    # Prix actuel du sous-jacent
+        self.r = r    # Taux sans risque
+        self.strikes, self.maturities, self.market_prices, self.is_call = (
+            np.array(x).ravel() for x in np.broadcast_arrays(strikes, maturities, market_prices, is_call))
+        self.strikes = self.strikes.astype(float)
+        self.maturities = self.maturities.astype(float)
+        self.market_prices = self.market_prices.astype(float)
+        self.is_call = self.is_call.astype(bool)
+        self.weights = np.ones_like(self.market_prices) if weights is None else np.asarray(weights, dtype=float).ravel()
+
+        self.num_nodes = num_nodes  # Nombre minimal de noeuds de quadrature (comme Heston_pricer)
+        self.tol = tol              # Tolérance sur la troncature de l'intégrale de Fourier (comme Heston_pricer)
+
+        # Termes indépendants des paramètres, calculés une seule fois
+        self.unique_maturities, maturity_index = np.unique(self.maturities, return_inverse=True)
+        self.maturity_quotes = [np.flatnonzero(maturity_index == j) for j in range(len(self.unique_maturities))]
+        self.discount = np.exp(-r * self.maturities)
+        self.log_moneyness = np.log(self.strikes / S)
+        self.grids = {}  # (maturité, borne arrondie) -> noeuds, poids et noyaux des cotations de la maturité
+
+        self.params = None   # Derniers paramètres calibrés (point de départ de la calibration suivante)
+        self.history = []    # Statistiques de chaque calibration
+
+    def _grid(self, j, u_max):
+        """Noeuds, poids et noyaux de la maturité d'indice j sur [0, u_max], mis en cache."""
+        key = (j, u_max)
+        if key not in self.grids:
+            nodes, node_weights = _legendre_nodes(quadrature_size(u_max, self.num_nodes))
+            u = u_max * nodes
+            kernel = np.exp(-1j * u * self.log_moneyness[self.maturity_quotes[j], np.newaxis]) / (1j * u)
+            self.grids[key] = u, u_max * node_weights / np.pi, kernel
+        return self.grids[key]
+
+    def price(self, params):
+        """Prix de toutes les cotations pour params = (kappa, theta, xi, rho, v0), une passe par maturité."""
+        kappa, theta, xi, rho, v0 = params
+        P1 = np.empty_like(self.strikes)
+        P2 = np.empty_like(self.strikes)
+        for j, T in enumerate(self.unique_maturities):
+            u_max = heston_integration_bound(T, kappa, theta, xi, rho, v0, self.tol)
+            u, w, kernel = self._grid(j, 2.0 ** np.ceil(np.log2(u_max)))
+            phi = heston_characteristic_function(u, T, self.r, kappa, theta, xi, rho, v0)
+            phi_shifted = heston_characteristic_function(u - 1j, T, self.r, kappa, theta, xi, rho, v0)
+            phi_shifted = phi_shifted * np.exp(-self.r * T)  # phi(u - i) / phi(-i)
+            quotes = self.maturity_quotes[j]
+            P1[quotes] = 0.5 + np.real(kernel * phi_shifted) @ w
+            P2[quotes] = 0.5 + np.real(kernel * phi) @ w
+        call_price = self.S * P1 - self.strikes * self.discount * P2
+        put_price = call_price - self.S + self.strikes * self.discount
+        return np.where(self.is_call, call_price, put_price)
+
+    def residuals(self, params):
+        return self.weights * (self.price(params) - self.market_prices)
+
+    def calibrate(self, initial_guess=None, max_nfev=200):
+        """Ajuste (kappa, theta, xi, rho, v0) par moindres carrés sur les prix.
+
+        Sans initial_guess, repart des derniers paramètres calibrés (ou d'un point par défaut).
+        Renvoie un dictionnaire : paramètres, erreur RMS, itérations, évaluations et temps de calcul.
+        """
+        if initial_guess is None:
+            initial_guess = self.params if self.params is not None else (2.0, 0.04, 0.5, -0.5, 0.04)
+        x0 = np.clip(initial_guess, self.lower_bounds, self.upper_bounds)
+
+        start = time.perf_counter()
+        result = least_squares(self.residuals, x0, bounds=(self.lower_bounds, self.upper_bounds),
+                               method='trf', x_scale='jac', max_nfev=max_nfev)
+        wall_time = time.perf_counter() - start
+
+        self.params = result.x
+        quoted = self.weights > 0  # Un poids nul retire la cotation
+        errors = (self.price(result.x) - self.market_prices)[quoted]
+        report = dict(zip(PARAMETER_NAMES, result.x))
+        report.update({
+            'rmse': np.sqrt(np.mean(errors ** 2)),
+            'iterations': result.njev,
+            'function_evaluations': result.nfev,
+            'wall_time': wall_time,
+            'success': result.success,
+        })
+        self.history.append(report)
+        return report
+
+    def update_prices(self, market_prices):
+        """Remplace les prix de marché (mêmes cotations) avant une nouvelle calibration."""
+        self.market_prices = np.asarray(market_prices, dtype=float).ravel()
@@ -1,15 +1,76 @@
+from functools import lru_cache
+
 import numpy as np
 from scipy.stats import norm
 
+from option_class.fft_pricer import FFT_pricer
+from option_class.monte_carlo import (check_sampling, finite_difference_greeks, monte_carlo_price, parse_variance_reduction,
+                                      seed_sequence, standard_normal, stream)
+
 # Modèle de Heston (Volatilité Stochastique)
 # Utilisé pour modéliser des options où la volatilité du sous-jacent n'est pas constante, mais évolue selon un processus stochastique.
 # Il est particulièrement adapté aux marchés où la volatilité fluctue fortement dans le temps.
 # Modèle populaire pour capturer des phénomènes comme le "smile" de volatilité observé sur les marchés.
+# Trois méthodes : 'mc' (Monte Carlo, dérive mu), 'quad' (formule semi-analytique par quadrature de Gauss-Legendre
+# sur la fonction caractéristique) et 'fft' (Carr-Madan, toute une grille de strikes en une FFT),
+# ces deux dernières sous la mesure risque-neutre.
+
+
+@lru_cache(maxsize=32)
+def _legendre_nodes(num_nodes):
+    """Noeuds et poids de Gauss-Legendre sur [0, 1], mis en cache."""
+    x, w = np.polynomial.legendre.leggauss(num_nodes)
+    return 0.5 * (x + 1), 0.5 * w
+
+
+def heston_characteristic_function(u, T, r, kappa, theta, xi, rho, v0):
+    """Fonction caractéristique de ln(S_T / S_0) sous la mesure risque-neutre.
+
+    Formulation "little Heston trap" (Albrecher et al.), stable pour les grandes maturités.
+    Tous les arguments sont broadcastables.
+    """
+    iu = 1j * u
+    beta = kappa - rho * xi * iu
+    d = np.sqrt(beta ** 2 + xi ** 2 * (iu + u ** 2))
+    g = (beta - d) / (beta + d)
+    exp_dT = np.exp(-d * T)
+    C = iu * r * T + kappa * theta / xi ** 2 * ((beta - d) * T - 2 * np.log((1 - g * exp_dT) / (1 - g)))
+    D = (beta - d) / xi ** 2 * (1 - exp_dT) / (1 - g * exp_dT)
+    return np.exp(C + D * v0)
+
+
+def heston_integration_bound(T, kappa, theta, xi, rho, v0, tol):
+    """Borne de troncature u_max telle que |phi(u)| < tol.
+
+    |phi| décroît comme exp(-0.5 * v * T * u^2) pour u modéré puis comme
+    exp(-u * sqrt(1 - rho^2) * (v0 + kappa * theta * T) / xi) pour u grand : on prend la plus grande des deux bornes.
+    """
+    log_tol = -np.log(tol)
+    variance = max(min(v0, theta), 1e-4)
+    u_gauss = np.sqrt(2 * log_tol / (variance * T))
+    decay = np.sqrt(1 - rho ** 2) * (v0 + kappa * theta * T) / xi
+    u_exp = log_tol / max(decay, 1e-8)
+    return max(50.0, min(max(u_gauss, u_exp), 1e4))
+
+
+def quadrature_size(u_max, num_nodes):
+    """Nombre de noeuds sur [0, u_max] : au moins num_nodes, et plus l'intervalle est long, plus il en faut.
+
+    Arrondi à une puissance de 2 pour réutiliser le cache de _legendre_nodes.
+    """
+    return max(num_nodes, 1 << int(np.ceil(np.log2(u_max / 2))))
+
 
 class Heston_pricer:
-    def __init__(self, S, K, T, r, kappa, theta, xi, rho, v0, mu, num_simulations=10000, num_steps=100):
+    num_factors = 2  # Browniens simulés par pas de temps (prix et variance)
+    scale_invariant = True  # S_T proportionnel à S_0 : une simulation sert tous les spots
+
+    def __init__(self, S, K, T, r, kappa, theta, xi, rho, v0, mu, num_simulations=10000, num_steps=100,
+                 method='mc', num_nodes=128, tol=1e-10, batch_size=None, variance_reduction=None, sampling='pseudo',
+                 num_replicates=8, seed=None, workers=None,
+                 target_std_error=None):
         self.S = S                   # Prix actuel du sous-jacent
-        self.K = K                   # Prix d'exercice
+        self.K = K                   # Prix d'exercice (scalaire ou tableau de strikes en méthode 'quad' ou 'fft')
         self.T = T                   # Maturité
         self.r = r                   # Taux sans risque
         self.kappa = kappa           # Vitesse de réversion de la variance vers theta
@@ -20,44 +81,134 @@ class Heston_pricer:
         self.mu = mu                 # Taux de rendement du sous-jacent
         self.num_simulations = num_simulations  # Nombre de simulations Monte Carlo
         self.num_steps = num_steps   # Nombre de pas dans chaque simulation
+        if method not in ('mc', 'quad', 'fft'):
+            raise ValueError("Method must be 'mc', 'quad' or 'fft'")
+        self.method = method         # Méthode de pricing
+        self.num_nodes = num_nodes   # Nombre minimal de noeuds de quadrature
+        self.tol = tol               # Tolérance sur la troncature de l'intégrale de Fourier
+        self.batch_size = batch_size  # Nombre maximal de trajectoires simulées à la fois (mémoire de pointe)
+        self.variance_reduction = parse_variance_reduction(variance_reduction)  # Techniques de réduction de variance
+        self.sampling = check_sampling(sampling, self.variance_reduction, num_replicates)  # 'pseudo' ou 'sobol'
+        self.num_replicates = num_replicates  # Nombre de brouillages indépendants en Sobol (estimation de l'erreur)
+        self.seed_sequence = seed_sequence(seed)  # Graine des flux aléatoires (entier, SeedSequence ou Generator)
+        self.workers = workers  # Processus utilisés pour simuler les lots (None : série, -1 : tous les coeurs)
+        self.target_std_error = target_std_error  # Erreur standard visée (arrêt adaptatif)
+        self.std_errors = None       # Erreurs standard Call et Put du dernier pricing Monte Carlo
+        self.num_paths = None       # Trajectoires simulées lors du dernier pricing Monte Carlo
+
+    def characteristic_function(self, u):
+        """Fonction caractéristique de ln(S_T / S_0) sous la mesure risque-neutre."""
+        return heston_characteristic_function(u, self.T, self.r, self.kappa, self.theta, self.xi, self.rho, self.v0)
 
-    def simulate_paths(self):
-        """Simule les chemins du modèle Heston pour le sous-jacent et la volatilité."""
+    def integration_bound(self):
+        """Borne de troncature u_max telle que |phi(u)| < tol (heston_integration_bound)."""
+        return heston_integration_bound(self.T, self.kappa, self.theta, self.xi, self.rho, self.v0, self.tol)
+
+    def time_slices(self, n, rng=None, with_control=False, Z=None):
+        """Génère, date par date, le sous-jacent sur n trajectoires (et le sous-jacent de contrôle si with_control).
+
+        Seule la tranche de temps courante est en mémoire : les gaussiennes sont tirées pas à pas par rng
+        (par défaut le premier flux du pricer), ou lues dans Z (2, num_steps, n) en quasi Monte Carlo.
+        Le sous-jacent de contrôle est un Black-Scholes (control_parameters) piloté par le même brownien W1.
+        """
         dt = self.T / self.num_steps
-        S_paths = np.zeros((self.num_steps + 1, self.num_simulations))
-        v_paths = np.zeros((self.num_steps + 1, self.num_simulations))
-        
+        if Z is None:
+            rng = stream(self) if rng is None else rng
+        if with_control:
+            drift, vol = self.control_parameters()
+
         # Conditions initiales
-        S_paths[0] = self.S
-        v_paths[0] = self.v0
-        
-        # Générer des variables aléatoires corrélées
-        Z1 = np.random.randn(self.num_steps, self.num_simulations)
-        Z2 = np.random.randn(self.num_steps, self.num_simulations)
-        W1 = Z1
-        W2 = self.rho * Z1 + np.sqrt(1 - self.rho ** 2) * Z2
-        
-        for t in range(1, self.num_steps + 1):
-            # Simulation des chemins pour la variance (Heston)
-            v_paths[t] = np.abs(v_paths[t - 1] + self.kappa * (self.theta - v_paths[t - 1]) * dt +
-                                self.xi * np.sqrt(v_paths[t - 1] * dt) * W2[t - 1])
-            
-            # Simulation des chemins pour le sous-jacent
-            S_paths[t] = S_paths[t - 1] * np.exp((self.mu - 0.5 * v_paths[t - 1]) * dt +
-                                                 np.sqrt(v_paths[t - 1] * dt) * W1[t - 1])
+        S_t = np.full(n, self.S, dtype=float)
+        v_t = np.full(n, self.v0, dtype=float)
+        control_t = np.full(n, self.S, dtype=float) if with_control else None
+        yield S_t, control_t
+
+        for t in range(self.num_steps):
+            # Variables aléatoires corrélées du pas t
+            if Z is None:
+                Z1 = standard_normal(rng, n, self.variance_reduction)
+                Z2 = standard_normal(rng, n, self.variance_reduction)
+            else:
+                Z1, Z2 = Z[0, t], Z[1, t]
+            W2 = self.rho * Z1 + np.sqrt(1 - self.rho ** 2) * Z2
 
+            # Sous-jacent (avec la variance du début du pas) puis variance (Heston)
+            S_t = S_t * np.exp((self.mu - 0.5 * v_t) * dt + np.sqrt(v_t * dt) * Z1)
+            v_t = np.abs(v_t + self.kappa * (self.theta - v_t) * dt + self.xi * np.sqrt(v_t * dt) * W2)
+            if with_control:
+                control_t = control_t * np.exp((drift - 0.5 * vol ** 2) * dt + vol * np.sqrt(dt) * Z1)
+            yield S_t, control_t
+
+    def simulate_paths(self, n=None, rng=None, with_control=False, Z=None):
+        """Simule les chemins du modèle Heston pour le sous-jacent, tableau (num_steps + 1, n).
+
+        Avec with_control=True, renvoie aussi les chemins du sous-jacent Black-Scholes de contrôle.
+        """
+        n = self.num_simulations if n is None else n
+        slices = list(self.time_slices(n, rng, with_control, Z))
+        S_paths = np.array([S_t for S_t, _ in slices])
+        if with_control:
+            return S_paths, np.array([control_t for _, control_t in slices])
         return S_paths
 
+    def simulate_terminal(self, n, rng=None, with_control=False, Z=None):
+        """Valeurs terminales du sous-jacent sur n trajectoires (et du sous-jacent de contrôle si with_control).
+
+        Simulation en flux : mémoire en O(n), indépendante du nombre de pas.
+        """
+        for S_t, control_t in self.time_slices(n, rng, with_control, Z):
+            pass
+        return (S_t, control_t) if with_control else S_t
+
+    def expected_terminal(self):
+        """E[S_T] sous la dynamique simulée (dérive mu), espérance de la variable de contrôle S_T."""
+        return self.S * np.exp(self.mu * self.T)
+
+    def control_parameters(self):
+        """Dérive et volatilité du sous-jacent Black-Scholes de contrôle.
+
+        La volatilité est la racine de la variance moyenne attendue sur [0, T] :
+        theta + (v0 - theta) * (1 - exp(-kappa T)) / (kappa T).
+        """
+        kappa_T = self.kappa * self.T
+        mean_reversion = (1 - np.exp(-kappa_T)) / kappa_T if kappa_T > 0 else 1.0
+        mean_variance = self.theta + (self.v0 - self.theta) * mean_reversion
+        return self.mu, np.sqrt(max(mean_variance, 1e-8))
+
+    def get_european_option_quad(self):
+        """Calcule les prix Call et Put européens par quadrature sur la fonction caractéristique.
+
+        call = S * P1 - K * exp(-rT) * P2 (Gil-Pelaez). Les noeuds sont partagés par tous les strikes de self.K.
+        """
+        K = np.asarray(self.K, dtype=float)
+        u_max = self.integration_bound()
+        nodes, weights = _legendre_nodes(quadrature_size(u_max, self.num_nodes))
+        u = u_max * nodes
+        w = u_max * weights
+
+        discount = np.exp(-self.r * self.T)
+        phi = self.characteristic_function(u)
+        phi_shifted = self.characteristic_function(u - 1j) * discount  # phi(u - i) / phi(-i)
+        log_moneyness = np.log(K / self.S)[..., np.newaxis]
+        kernel = np.exp(-1j * u * log_moneyness) / (1j * u)
+        P1 = 0.5 + np.real(kernel * phi_shifted) @ w / np.pi
+        P2 = 0.5 + np.real(kernel * phi) @ w / np.pi
+
+        call_price = self.S * P1 - K * discount * P2
+        put_price = call_price - self.S + K * discount
+        return call_price[()], put_price[()]
+
     def get_european_option(self):
         """Calcule les prix des options Call et Put européennes en utilisant le modèle de Heston."""
-        S_paths = self.simulate_paths()
-        # Calculer les prix à maturité
-        S_T = S_paths[-1]
-        call_payoff = np.maximum(S_T - self.K, 0)
-        put_payoff = np.maximum(self.K - S_T, 0)
+        if self.method == 'quad':
+            return self.get_european_option_quad()
+        if self.method == 'fft':
+            return FFT_pricer(self.characteristic_function, self.S, self.K, self.T, self.r).get_european_option()
+        return monte_carlo_price(self)
 
-        # Actualisation pour obtenir les prix
-        call_price = np.exp(-self.r * self.T) * np.mean(call_payoff)
-        put_price = np.exp(-self.r * self.T) * np.mean(put_payoff)
+    def get_greeks(self):
+        """Grecques Call et Put (delta, gamma, vega en v0, theta).
 
-        return call_price, put_price
\ No newline at end of file
+        En Monte Carlo : delta et gamma pathwise, vega et theta par différences centrées à nombres aléatoires communs.
+        """
+        return finite_difference_greeks(self, 'v0', pathwise=self.method == 'mc')
@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.special import ndtr
+
+from option_class.bs_pricer import BS_pricer
+
+# Volatilité implicite Black-Scholes pour des chaînes d'options entières
+# Inverse la formule de BS_pricer sur des tableaux de cotations (price, S, K, T, r) en un seul appel.
+# Chaque cotation est ramenée par parité Call-Put à l'option hors de la monnaie (Put si K < F, Call sinon), dont le
+# prix est la valeur temps seule : un Call très dans la monnaie, dont le prix est presque entièrement valeur
+# intrinsèque, est inversé sur son Put, sans perte de précision.
+# Méthode de Newton partant du point d'inflexion sigma* = sqrt(2 |ln(F / K)| / T) (Manaster-Koehler),
+# sécurisée par un encadrement [lo, hi] : tout pas de Newton qui sort de l'encadrement est remplacé par une bissection,
+# ce qui garantit la convergence. L'arrêt porte sur la volatilité (pas de Newton ou largeur de l'encadrement
+# sous tol), pas sur l'écart de prix ; une cotation n'est signalée convergée que si son prix détermine la
+# volatilité à tol près (arrondi du prix coté divisé par vega) : les valeurs temps noyées dans l'arrondi du prix
+# sont écartées.
+# Seules les cotations non convergées sont recalculées à chaque itération.
+
+
+def implied_volatility(price, S, K, T, r, option_type='call', tol=1e-10, max_iter=100, vol_bounds=(1e-6, 10.0)):
+    """Volatilités implicites et indicateurs de convergence, par broadcasting des entrées.
+
+    tol est la précision visée sur la volatilité. Les prix hors des bornes d'arbitrage (valeur temps nulle ou
+    négative, Call au-dessus de S, Put au-dessus du strike actualisé) renvoient NaN avec converged=False.
+    """
+    if option_type not in ('call', 'put'):
+        raise ValueError("option_type must be 'call' or 'put'")
+    price, S, K, T, r = (np.array(x, dtype=float) for x in
+                         np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (price, S, K, T, r))))
+    discount_K = K * np.exp(-r * T)
+    # Option hors de la monnaie : Put si le Call est dans la monnaie (sign = -1), Call sinon (sign = 1)
+    sign = np.where(S > discount_K, -1.0, 1.0)
+    if option_type == 'call':
+        otm_price = np.where(sign < 0, price - (S - discount_K), price)
+    else:
+        otm_price = np.where(sign > 0, price - (discount_K - S), price)
+
+    vol = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    valid = (otm_price > 0) & (otm_price < np.where(sign > 0, S, discount_K)) & (T > 0)
+
+    lo = np.full(price.shape, vol_bounds[0])
+    hi = np.full(price.shape, vol_bounds[1])
+    sigma = np.sqrt(2 * np.abs(np.log(S / discount_K)) / np.where(T > 0, T, 1))
+    sigma = np.clip(sigma, vol_bounds[0], vol_bounds[1])
+    sigma = np.where(sigma > vol_bounds[0], sigma, 0.2)
+
+    active = np.flatnonzero(valid)
+    flat = (price.ravel(), otm_price.ravel(), S.ravel(), K.ravel(), T.ravel(), r.ravel(), discount_K.ravel(),
+            sign.ravel(), lo.ravel(), hi.ravel(), sigma.ravel())
+    quote_f, price_f, S_f, K_f, T_f, r_f, dK_f, sign_f, lo_f, hi_f, sigma_f = flat
+    vol_f, converged_f = vol.ravel(), converged.ravel()
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        s = sigma_f[active]
+        w = sign_f[active]
+        d1, d2 = BS_pricer.get_BS_parameter(S_f[active], K_f[active], T_f[active], r_f[active], s)
+        model_price = w * (S_f[active] * ndtr(w * d1) - dK_f[active] * ndtr(w * d2))
+        vega = S_f[active] * np.exp(-0.5 * d1**2) / np.sqrt(2 * np.pi) * np.sqrt(T_f[active])
+        diff = model_price - price_f[active]
+
+        # Le prix est croissant en sigma : mise à jour de l'encadrement
+        above = diff > 0
+        hi_f[active] = np.where(above, s, hi_f[active])
+        lo_f[active] = np.where(above, lo_f[active], s)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = diff / vega
+            resolution = np.finfo(float).eps * np.abs(quote_f[active]) / vega  # Volatilité d'un arrondi du prix
+        done = (np.abs(step) <= tol) | (hi_f[active] - lo_f[active] < tol)
+        vol_f[active[done]] = s[done]
+        converged_f[active[done]] = resolution[done] <= tol
+
+        newton = s - step
+        bisection = 0.5 * (lo_f[active] + hi_f[active])
+        inside = np.isfinite(newton) & (newton > lo_f[active]) & (newton < hi_f[active])
+        sigma_f[active] = np.where(inside, newton, bisection)
+        active = active[~done]
+
+    # Cotations non convergées : meilleure estimation disponible, signalée par converged=False
+    vol_f[active] = sigma_f[active]
+    return vol_f.reshape(price.shape)[()], converged_f.reshape(price.shape)[()]
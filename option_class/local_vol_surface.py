@@ -0,0 +1,103 @@
+import numpy as np
+from scipy.interpolate import UnivariateSpline
+
+from option_class.dupire_pricer import bilinear_interpolate
+from option_class.implied_vol import implied_volatility
+
+# Surface de volatilité locale de Dupire construite à partir d'une grille de volatilités implicites (ou de prix) de marché
+# La formule de Dupire est appliquée une seule fois, sous la forme de Gatheral en variance totale implicite
+# w(y, T) = sigma_imp^2 * T avec y = ln(K / F_T) : dérivées en y lissées par spline sur chaque maturité,
+# dérivée en T par différences finies entre maturités. Le résultat est stocké dans une table (maturités x log-moneyness)
+# lue par interpolation bilinéaire : l'objet s'utilise directement comme local_vol_surface de Dupire_pricer.
+# Quand une seule maturité change, seules cette tranche et ses deux voisines sont recalculées (update_slice).
+
+class LocalVol_surface:
+    def __init__(self, S, r, strikes, maturities, implied_vols, num_points=101, smoothing=1e-4, min_variance=1e-6):
+        self.S = S                # Prix actuel du sous-jacent
+        self.r = r                # Taux sans risque
+        self.strikes = np.asarray(strikes, dtype=float)            # Strikes de la grille de marché
+        self.maturities = np.asarray(maturities, dtype=float)      # Maturités croissantes de la grille de marché
+        implied_vols = np.array(implied_vols, dtype=float)         # Volatilités implicites (maturités x strikes)
+        if implied_vols.shape != (len(self.maturities), len(self.strikes)):
+            raise ValueError("implied_vols must have shape (len(maturities), len(strikes))")
+        if np.any(np.diff(self.maturities) <= 0) or self.maturities[0] <= 0:
+            raise ValueError("Maturities must be positive and strictly increasing")
+        if len(self.strikes) < 4:
+            raise ValueError("At least four strikes are needed per maturity")
+        self.implied_vols = implied_vols
+        self.smoothing = smoothing        # Erreur RMS tolérée sur la variance totale par le lissage
+        self.min_variance = min_variance  # Plancher de la variance locale (zones d'arbitrage calendaire)
+
+        # Grille commune en log-moneyness, couvrant toutes les maturités
+        log_moneyness = self._log_moneyness(self.maturities[:, np.newaxis])
+        self.y_grid = np.linspace(log_moneyness.min(), log_moneyness.max(), num_points)
+
+        shape = (len(self.maturities), num_points)
+        self.w = np.zeros(shape)       # Variance totale implicite
+        self.w_y = np.zeros(shape)     # Dérivée première en y
+        self.w_yy = np.zeros(shape)    # Dérivée seconde en y
+        self.w_T = np.zeros(shape)     # Dérivée en T
+        self.local_var = np.zeros(shape)
+        for j in range(len(self.maturities)):
+            self._fit_slice(j)
+        self._update_local_var(range(len(self.maturities)))
+
+    @classmethod
+    def from_prices(cls, S, r, strikes, maturities, call_prices, **kwargs):
+        """Construit la surface à partir d'une grille de prix Call (maturités x strikes), inversés en volatilités."""
+        strikes = np.asarray(strikes, dtype=float)
+        maturities = np.asarray(maturities, dtype=float)
+        implied_vols, converged = implied_volatility(call_prices, S, strikes, maturities[:, np.newaxis], r)
+        if not np.all(converged):
+            raise ValueError("Some call prices could not be inverted into implied volatilities")
+        return cls(S, r, strikes, maturities, implied_vols, **kwargs)
+
+    def _log_moneyness(self, T):
+        return np.log(self.strikes / (self.S * np.exp(self.r * T)))
+
+    def _fit_slice(self, j):
+        """Lisse la variance totale de la maturité j en y et tabule w, w_y et w_yy sur y_grid."""
+        T = self.maturities[j]
+        y = self._log_moneyness(T)
+        w = self.implied_vols[j] ** 2 * T
+        spline = UnivariateSpline(y, w, k=3, s=len(y) * self.smoothing ** 2)
+        # Extrapolation plate hors de la plage de strikes cotés : dérivées nulles
+        inside = (self.y_grid >= y[0]) & (self.y_grid <= y[-1])
+        y_clipped = np.clip(self.y_grid, y[0], y[-1])
+        self.w[j] = spline(y_clipped)
+        self.w_y[j] = spline.derivative(1)(y_clipped) * inside
+        self.w_yy[j] = spline.derivative(2)(y_clipped) * inside
+
+    def _update_local_var(self, slices):
+        """Recalcule w_T puis la variance locale (formule de Gatheral) pour les maturités indiquées."""
+        T = np.concatenate([[0.0], self.maturities])
+        w = np.vstack([np.zeros_like(self.y_grid), self.w])  # w(y, 0) = 0
+        last = len(self.maturities)
+        for j in slices:
+            k = j + 1  # Indice dans la grille complétée par T = 0
+            if k == last:
+                self.w_T[j] = (w[k] - w[k - 1]) / (T[k] - T[k - 1])
+            else:
+                h1, h2 = T[k] - T[k - 1], T[k + 1] - T[k]
+                self.w_T[j] = (h1**2 * w[k + 1] - h2**2 * w[k - 1] + (h2**2 - h1**2) * w[k]) / (h1 * h2 * (h1 + h2))
+
+            y, w_j, w_y, w_yy = self.y_grid, self.w[j], self.w_y[j], self.w_yy[j]
+            denominator = (1 - y / w_j * w_y + 0.25 * (-0.25 - 1 / w_j + y**2 / w_j**2) * w_y**2 + 0.5 * w_yy)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                local_var = self.w_T[j] / denominator
+            self.local_var[j] = np.where(np.isfinite(local_var) & (denominator > 0),
+                                         np.maximum(local_var, self.min_variance), self.min_variance)
+        self.local_vol_table = np.sqrt(self.local_var)
+
+    def update_slice(self, j, implied_vols):
+        """Remplace les volatilités implicites de la maturité j et ne recalcule que les tranches affectées."""
+        self.implied_vols[j] = np.asarray(implied_vols, dtype=float)
+        self._fit_slice(j)
+        self._update_local_var(range(max(j - 1, 0), min(j + 2, len(self.maturities))))
+
+    def __call__(self, S, t):
+        """Volatilité locale en (S, t), par interpolation bilinéaire de la table en (y, T)."""
+        y = np.log(np.asarray(S, dtype=float) / (self.S * np.exp(self.r * np.asarray(t, dtype=float))))
+        if len(self.maturities) == 1:
+            return np.interp(y, self.y_grid, self.local_vol_table[0])
+        return bilinear_interpolate(self.y_grid, self.maturities, self.local_vol_table, y, t)
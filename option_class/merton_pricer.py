@@ -1,12 +1,23 @@
 import numpy as np
-from scipy.stats import norm
+from scipy.stats import norm, poisson
+
+from option_class.bs_pricer import BS_pricer
+from option_class.fft_pricer import FFT_pricer
+from option_class.monte_carlo import (finite_difference_greeks, monte_carlo_price, parse_variance_reduction, seed_sequence,
+                                      standard_normal, stream, uniform)
 
 # Modèle de Merton
 # Utilisé pour capturer les sauts soudains dans le prix d'un actif, en modélisant un processus de saut en plus du mouvement brownien.
 # Particulièrement utile pour des sous-jacents qui peuvent subir des chocs brusques et rares, tels que des annonces économiques.
+# Méthodes : 'mc' (Monte Carlo), 'fft' (Carr-Madan sur la fonction caractéristique) ou 'analytic'
+# (série de Merton : somme de prix Black-Scholes pondérés par la loi de Poisson), toutes sous la mesure risque-neutre.
 
 class Merton_pricer:
-    def __init__(self, S, K, T, r, sigma, lambda_j, mu_j, sigma_j, num_simulations=10000):
+    scale_invariant = True  # S_T proportionnel à S_0 : une simulation sert tous les spots
+
+    def __init__(self, S, K, T, r, sigma, lambda_j, mu_j, sigma_j, num_simulations=10000, method='mc', tol=1e-12,
+                 batch_size=None, variance_reduction=None, seed=None, workers=None,
+                 target_std_error=None):
         self.S = S          # Prix de l'actif sous-jacent
         self.K = K          # Prix d'exercice
         self.T = T          # Maturité
@@ -16,23 +27,93 @@ class Merton_pricer:
         self.mu_j = mu_j    # Taille moyenne des sauts (log-normale)
         self.sigma_j = sigma_j  # Volatilité des sauts
         self.num_simulations = num_simulations  # Nombre de simulations Monte Carlo
+        if method not in ('mc', 'fft', 'analytic'):
+            raise ValueError("Method must be 'mc', 'fft' or 'analytic'")
+        self.method = method  # Méthode de pricing
+        self.tol = tol      # Masse de Poisson négligée lors de la troncature de la série
+        self.batch_size = batch_size  # Nombre maximal de trajectoires simulées à la fois (mémoire de pointe)
+        self.variance_reduction = parse_variance_reduction(variance_reduction)  # Techniques de réduction de variance
+        self.seed_sequence = seed_sequence(seed)  # Graine des flux aléatoires (entier, SeedSequence ou Generator)
+        self.workers = workers  # Processus utilisés pour simuler les lots (None : série, -1 : tous les coeurs)
+        self.target_std_error = target_std_error  # Erreur standard visée (arrêt adaptatif)
+        self.std_errors = None  # Erreurs standard Call et Put du dernier pricing Monte Carlo
+        self.num_paths = None  # Trajectoires simulées lors du dernier pricing Monte Carlo
 
-    def get_european_option(self):
-        dt = self.T / 365
-        S_paths = np.zeros(self.num_simulations)
-        S_paths.fill(self.S)
+    def characteristic_function(self, u):
+        """Fonction caractéristique de ln(S_T / S_0) sous la mesure risque-neutre (sauts compensés)."""
+        drift = self.r - 0.5 * self.sigma**2 - self.lambda_j * self.jump_mean()
+        jumps = np.exp(1j * u * self.mu_j - 0.5 * self.sigma_j**2 * u**2) - 1
+        return np.exp(1j * u * drift * self.T - 0.5 * self.sigma**2 * u**2 * self.T + self.lambda_j * self.T * jumps)
+
+    def jump_mean(self):
+        """kappa = E[e^J] - 1, taille moyenne relative d'un saut."""
+        return np.exp(self.mu_j + 0.5 * self.sigma_j**2) - 1
+
+    def simulate_terminal(self, n, rng=None, with_control=False):
+        """Simule n valeurs terminales du sous-jacent sous la mesure risque-neutre, en une passe vectorisée, tirées par rng.
+
+        Les sauts sont compensés (dérive -lambda_j * kappa) : S_T e^{-rT} est une martingale, comme pour les méthodes
+        'analytic' et 'fft'. Avec with_control=True, renvoie aussi la partie diffusive seule (sous-jacent Black-Scholes de contrôle).
+        Le nombre de sauts est tiré par inversion de la fonction de répartition : à tirages égaux, N est croissant
+        en lambda_j * T, ce qui garde les grecques à nombres aléatoires communs stables. En antithétique, l'uniforme
+        de N est apparié comme les gaussiennes (U et 1 - U) : peu de sauts sur une trajectoire, beaucoup sur sa paire.
+        """
+        rng = stream(self) if rng is None else rng
+        intensity = self.lambda_j * self.T
+        n_max = int(poisson.isf(self.tol, intensity)) + 1 if intensity > 0 else 0
+        cdf = poisson.cdf(np.arange(n_max + 1), intensity)
+        N = np.minimum(np.searchsorted(cdf, uniform(rng, n, self.variance_reduction)), n_max)  # Sauts par trajectoire
+        # Somme de N sauts gaussiens i.i.d. : loi normale de moyenne N * mu_j et d'écart-type sqrt(N) * sigma_j
+        jump_sum = self.mu_j * N + self.sigma_j * np.sqrt(N) * standard_normal(rng, n, self.variance_reduction)
+        jump_sum -= self.lambda_j * self.jump_mean() * self.T  # Compensation des sauts
+        Z = standard_normal(rng, n, self.variance_reduction)
+        S_diffusion = self.S * np.exp((self.r - 0.5 * self.sigma**2) * self.T + self.sigma * np.sqrt(self.T) * Z)
+        if with_control:
+            return S_diffusion * np.exp(jump_sum), S_diffusion
+        return S_diffusion * np.exp(jump_sum)
 
-        for i in range(self.num_simulations):
-            N = np.random.poisson(self.lambda_j * self.T)  # Nombre de sauts
-            jump_sizes = np.random.normal(self.mu_j, self.sigma_j, N)  # Taille des sauts
-            S_jumps = np.exp(np.sum(jump_sizes))  # Facteur multiplicatif dû aux sauts
-            S_paths[i] *= S_jumps * np.exp((self.r - 0.5 * self.sigma**2) * self.T +
-                                           self.sigma * np.sqrt(self.T) * np.random.normal())
+    def expected_terminal(self):
+        """E[S_T] = S_0 exp(rT) sous la dynamique simulée (sauts compensés), espérance de la variable de contrôle S_T."""
+        return self.S * np.exp(self.r * self.T)
 
-        call_payoff = np.maximum(S_paths - self.K, 0)
-        put_payoff = np.maximum(self.K - S_paths, 0)
+    def control_parameters(self):
+        """Dérive et volatilité du sous-jacent Black-Scholes de contrôle (diffusion sans les sauts)."""
+        return self.r, self.sigma
+
+    def get_european_option_analytic(self):
+        """Formule fermée de Merton, vectorisée sur S et K (broadcasting).
+
+        La série est tronquée au plus petit n_max dont la queue de Poisson est inférieure à tol.
+        """
+        kappa = self.jump_mean()
+        lambda_prime = self.lambda_j * (1 + kappa) * self.T
+        n_max = int(poisson.isf(self.tol, lambda_prime)) + 1 if lambda_prime > 0 else 0
+        n = np.arange(n_max + 1)
+        weights = poisson.pmf(n, lambda_prime)
+
+        S = np.asarray(self.S, dtype=float)
+        K = np.asarray(self.K, dtype=float)
+        shape = np.broadcast_shapes(S.shape, K.shape)
+        n_axis = (slice(None),) + (np.newaxis,) * len(shape)
+        # Conditionnellement à n sauts, le sous-jacent est log-normal : prix Black-Scholes à r_n et sigma_n
+        sigma_n = np.sqrt(self.sigma**2 + n * self.sigma_j**2 / self.T)[n_axis]
+        r_n = (self.r - self.lambda_j * kappa + n * np.log(1 + kappa) / self.T)[n_axis]
+        call_n, put_n = BS_pricer.price(S, K, self.T, r_n, sigma_n)
+        # Les poids de Poisson d'intensité lambda * (1 + kappa) absorbent l'écart d'actualisation entre r_n et r
+        call_price = np.sum(weights[n_axis] * call_n, axis=0)
+        put_price = np.sum(weights[n_axis] * put_n, axis=0)
+        return call_price[()], put_price[()]
+
+    def get_european_option(self):
+        if self.method == 'analytic':
+            return self.get_european_option_analytic()
+        if self.method == 'fft':
+            return FFT_pricer(self.characteristic_function, self.S, self.K, self.T, self.r).get_european_option()
+        return monte_carlo_price(self)
 
-        call_price = np.exp(-self.r * self.T) * np.mean(call_payoff)
-        put_price = np.exp(-self.r * self.T) * np.mean(put_payoff)
+    def get_greeks(self):
+        """Grecques Call et Put (delta, gamma, vega en sigma, theta).
 
-        return call_price, put_price
\ No newline at end of file
+        En Monte Carlo : delta et gamma pathwise, vega et theta par différences centrées à nombres aléatoires communs.
+        """
+        return finite_difference_greeks(self, 'sigma', pathwise=self.method == 'mc')
@@ -0,0 +1,591 @@
+import copy
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+from scipy.special import ndtri
+from scipy.stats import qmc
+
+from option_class.bs_pricer import BS_pricer
+from option_class.parallel import fill_array, map_tasks, resolve_workers
+
+# Outils communs aux pricers Monte Carlo (Heston, Merton, Variance Gamma, Dupire)
+# Les trajectoires sont générées par lots vectorisés : batch_size borne la mémoire de pointe
+# et les moyennes/variances des payoffs sont cumulées lot par lot.
+# Chaque pricer possède sa propre SeedSequence (paramètre seed) : le lot i est tiré par un Generator dédié, dérivé
+# de façon déterministe de la graine et de i. Les prix sont reproductibles au bit près pour une graine et un découpage
+# en lots donnés, et les lots sont des flux indépendants qui peuvent être simulés dans n'importe quel ordre ou processus.
+# Les grecques sont calculées avec des nombres aléatoires communs (CRN) : les copies modifiées du pricer partagent
+# sa graine et rejouent donc les mêmes tirages.
+# Réduction de variance optionnelle, commune à tous les pricers (paramètre variance_reduction) :
+# - 'antithetic' : chaque tirage gaussien Z est apparié à -Z, et chaque uniforme U (nombre de sauts de Merton, temps
+#   gamma de VG) à 1 - U ; l'erreur standard est estimée sur les moyennes de paires ;
+# - 'moment_matching' : les tirages gaussiens de chaque pas sont recentrés et réduits (moyenne 0, variance 1 exactes) ;
+# - 'control_variate' : variable de contrôle S_T, d'espérance connue sous la dynamique simulée ;
+# - 'bs_control_variate' : payoff d'un sous-jacent Black-Scholes simulé sur les mêmes browniens,
+#   d'espérance donnée par BS_pricer (Heston et Dupire).
+# Le coefficient de contrôle b = Cov(Y, X) / Var(X) est estimé sur l'ensemble des trajectoires.
+# Les simulateurs à plusieurs pas (Heston, Dupire) acceptent aussi sampling='sobol' : quasi Monte Carlo par suites de
+# Sobol brouillées, chemins construits par pont brownien (les premières coordonnées, les mieux réparties, fixent
+# la forme globale des trajectoires). L'erreur est estimée sur num_replicates réplications (RQMC) : une suite brouillée
+# (LMS) par pricing, décalée par un XOR aléatoire indépendant (digital shift) à chaque réplication.
+# Avec workers > 1, les lots sont simulés sur un pool de processus (option_class.parallel) puis leurs statistiques
+# fusionnées exactement, dans l'ordre des lots. Le découpage en lots ne dépend que de num_simulations et batch_size
+# (sans batch_size, lots de DEFAULT_BATCH_SIZE trajectoires), jamais du nombre de workers : pour une graine donnée,
+# le prix est identique au bit près en série et en parallèle, quel que soit le nombre de coeurs.
+# Arrêt adaptatif (paramètre target_std_error) : les lots sont simulés par vagues, et la simulation s'arrête au premier
+# lot (dans l'ordre des lots) après lequel l'erreur standard des deux prix passe sous la cible ; num_simulations
+# devient le nombre maximal de trajectoires. Les lots d'une vague simulés au-delà de ce point sont écartés.
+# Les simulateurs ne gardent en mémoire que la tranche de temps courante : la mémoire est en O(taille de lot).
+
+DEFAULT_BATCH_SIZE = 2**14   # Taille de lot par défaut (répartition sur les workers, mémoire de pointe)
+ADAPTIVE_BATCH_SIZE = 10000  # Taille de lot par défaut en arrêt adaptatif (l'erreur est testée après chaque lot)
+
+SOBOL_BITS = 30  # Précision des points de Sobol (en bits)
+
+SCALED_BLOCK_SIZE = 2**20  # Éléments (trajectoires x cases) remis à l'échelle à la fois par scaled_prices
+
+VARIANCE_REDUCTION_METHODS = ('antithetic', 'moment_matching', 'control_variate', 'bs_control_variate')
+
+
+def batch_sizes(num_simulations, batch_size=None):
+    """Découpe num_simulations en lots d'au plus batch_size trajectoires (un seul lot si batch_size est None)."""
+    num_simulations = int(num_simulations)
+    if num_simulations <= 0:
+        raise ValueError("Number of simulations must be positive")
+    if batch_size is None or batch_size >= num_simulations:
+        return [num_simulations]
+    if batch_size <= 0:
+        raise ValueError("Batch size must be positive")
+    batch_size = int(batch_size)
+    sizes = [batch_size] * (num_simulations // batch_size)
+    if num_simulations % batch_size:
+        sizes.append(num_simulations % batch_size)
+    return sizes
+
+
+def parse_variance_reduction(variance_reduction, allowed=VARIANCE_REDUCTION_METHODS):
+    """Normalise l'option variance_reduction (None, un nom ou une liste de noms) en frozenset."""
+    if variance_reduction is None:
+        return frozenset()
+    if isinstance(variance_reduction, str):
+        variance_reduction = (variance_reduction,)
+    methods = frozenset(variance_reduction)
+    unknown = methods.difference(allowed)
+    if unknown:
+        raise ValueError("Unknown variance reduction method(s): %s (expected among %s)"
+                         % (', '.join(sorted(unknown)), ', '.join(allowed)))
+    if {'control_variate', 'bs_control_variate'} <= methods:
+        raise ValueError("Only one control variate can be used at a time")
+    return methods
+
+
+def seed_sequence(seed=None):
+    """SeedSequence d'un pricer à partir d'une graine entière, d'une SeedSequence ou d'un Generator.
+
+    Sans graine, l'entropie vient du système : chaque pricer a alors son propre flux, fixé pour toute sa durée de vie.
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2**63, size=4))
+    return np.random.SeedSequence(seed)
+
+
+def stream(pricer, index=0):
+    """Generator du lot index : enfant déterministe de la SeedSequence du pricer (même résultat à chaque appel)."""
+    parent = pricer.seed_sequence
+    return np.random.default_rng(np.random.SeedSequence(parent.entropy, spawn_key=parent.spawn_key + (index,)))
+
+
+def standard_normal(rng, shape, variance_reduction=frozenset()):
+    """Tirages N(0, 1) de forme shape tirés par le Generator rng, les trajectoires sur le dernier axe.
+
+    Avec 'antithetic', la seconde moitié des trajectoires reprend l'opposé de la première ;
+    avec 'moment_matching', chaque ligne est recentrée et réduite sur les trajectoires.
+    """
+    shape = tuple(np.atleast_1d(shape))
+    n = shape[-1]
+    if 'antithetic' in variance_reduction:
+        half = rng.standard_normal(shape[:-1] + ((n + 1) // 2,))
+        Z = np.concatenate([half, -half], axis=-1)[..., :n]
+    else:
+        Z = rng.standard_normal(shape)
+    if 'moment_matching' in variance_reduction and n > 1:
+        Z = Z - Z.mean(axis=-1, keepdims=True)
+        Z = Z / Z.std(axis=-1, keepdims=True)
+    return Z
+
+
+def uniform(rng, n, variance_reduction=frozenset()):
+    """n tirages uniformes sur [0, 1) tirés par le Generator rng (variables inversées par fonction de répartition).
+
+    Avec 'antithetic', la seconde moitié reprend 1 - U de la première, comme standard_normal apparie Z et -Z :
+    les deux trajectoires d'une paire sont opposées pour tous leurs tirages.
+    """
+    if 'antithetic' not in variance_reduction:
+        return rng.random(n)
+    half = rng.random((n + 1) // 2)
+    mirrored = np.minimum(1 - half, np.nextafter(1.0, 0.0))  # 1 - 0 exclu : [0, 1) comme rng.random
+    return np.concatenate([half, mirrored])[:n]
+
+
+def simulation_batches(pricer):
+    """Tailles des lots simulés par le pricer (paires complètes en antithétique).
+
+    Sans batch_size, des lots de DEFAULT_BATCH_SIZE trajectoires (ADAPTIVE_BATCH_SIZE en arrêt adaptatif).
+    Le découpage ne dépend pas du nombre de workers : il fixe les tirages, donc le prix.
+    """
+    batch_size = getattr(pricer, 'batch_size', None)
+    if batch_size is None:
+        adaptive = getattr(pricer, 'target_std_error', None) is not None
+        batch_size = ADAPTIVE_BATCH_SIZE if adaptive else DEFAULT_BATCH_SIZE
+    sizes = batch_sizes(pricer.num_simulations, batch_size)
+    if 'antithetic' in getattr(pricer, 'variance_reduction', ()):
+        sizes = [n + n % 2 for n in sizes]
+    return sizes
+
+
+def check_sampling(sampling, variance_reduction, num_replicates):
+    """Valide le mode d'échantillonnage ('pseudo' ou 'sobol') et sa compatibilité avec la réduction de variance."""
+    if sampling not in ('pseudo', 'sobol'):
+        raise ValueError("Sampling must be 'pseudo' or 'sobol'")
+    if sampling == 'sobol':
+        if variance_reduction & {'antithetic', 'moment_matching'}:
+            raise ValueError("Antithetic variates and moment matching do not apply to Sobol sampling")
+        if int(num_replicates) < 2:
+            raise ValueError("Sobol sampling needs at least two replicates to estimate the error")
+    return sampling
+
+
+@lru_cache(maxsize=32)
+def _bridge_plan(num_steps):
+    """Ordre de construction du pont brownien sur les dates 1..num_steps (unités de dt).
+
+    Chaque entrée (t, l, r, poids de W_l, poids de W_r, écart-type) fixe W_t sachant W_l et W_r,
+    les intervalles étant coupés en deux du plus grand au plus petit.
+    """
+    plan = [(num_steps, 0, 0, 0.0, 0.0, np.sqrt(num_steps))]
+    intervals = deque([(0, num_steps)])
+    while intervals:
+        left, right = intervals.popleft()
+        if right - left < 2:
+            continue
+        t = (left + right) // 2
+        plan.append((t, left, right, (right - t) / (right - left), (t - left) / (right - left),
+                     np.sqrt((t - left) * (right - t) / (right - left))))
+        intervals.extend([(left, t), (t, right)])
+    return tuple(plan)
+
+
+def brownian_bridge(Z):
+    """Transforme des gaussiennes rangées par importance (axe -2 : num_steps) en incréments browniens réduits.
+
+    Z[..., 0, :] fixe W_T, Z[..., 1, :] le milieu, etc. Le résultat a la même loi que des tirages i.i.d. N(0, 1)
+    et s'utilise à la place des incréments dW / sqrt(dt).
+    """
+    num_steps = Z.shape[-2]
+    W = np.zeros(Z.shape[:-2] + (num_steps + 1, Z.shape[-1]))
+    for k, (t, left, right, w_left, w_right, std) in enumerate(_bridge_plan(num_steps)):
+        W[..., t, :] = w_left * W[..., left, :] + w_right * W[..., right, :] + std * Z[..., k, :]
+    return np.diff(W, axis=-2)
+
+
+def sobol_normals(engine, n, num_factors, num_steps, shift):
+    """n trajectoires gaussiennes (num_factors, num_steps, n) tirées d'une suite de Sobol, construites par pont brownien.
+
+    shift est le décalage digital (entiers sur SOBOL_BITS bits, un par coordonnée) de la réplication.
+    Les coordonnées de Sobol sont attribuées par ordre d'importance du pont, tous facteurs confondus.
+    """
+    points = np.rint(engine.random(n) * 2**SOBOL_BITS).astype(np.int64)
+    u = ((points ^ shift) + 0.5) / 2**SOBOL_BITS
+    Z = ndtri(u).reshape(n, num_steps, num_factors)
+    return brownian_bridge(Z.transpose(2, 1, 0))
+
+
+@lru_cache(maxsize=8)
+def _sobol_engine(entropy, spawn_key, dimension):
+    """Suite de Sobol brouillée d'un pricer, mise en cache : le brouillage n'est calculé qu'une fois par graine."""
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key + (0,)))
+    return qmc.Sobol(dimension, scramble=True, bits=SOBOL_BITS, seed=rng)
+
+
+def simulation_tasks(pricer):
+    """Lots simulés par le pricer : liste de (indice de réplication, indice du lot, nombre de trajectoires).
+
+    En pseudo-aléatoire, une seule réplication découpée selon simulation_batches. En Sobol, num_replicates réplications
+    de 2^m points chacune (num_simulations est arrondi à la puissance de 2 supérieure), découpées en lots de puissances
+    de 2 d'au plus batch_size points (DEFAULT_BATCH_SIZE par défaut, indépendamment du nombre de workers).
+    Les lots sont rangés par indice puis par réplication : tout préfixe de num_replicates lots couvre chaque réplication.
+    """
+    if getattr(pricer, 'sampling', 'pseudo') != 'sobol':
+        return [(0, index, n) for index, n in enumerate(simulation_batches(pricer))]
+
+    num_replicates = int(pricer.num_replicates)
+    num_points = 1 << int(np.ceil(np.log2(max(pricer.num_simulations / num_replicates, 1))))
+    batch_size = getattr(pricer, 'batch_size', None)
+    if batch_size is None and getattr(pricer, 'target_std_error', None) is not None:
+        batch_size = ADAPTIVE_BATCH_SIZE // num_replicates
+    elif batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZE
+    chunk = min(num_points, 1 << int(np.log2(max(batch_size, 1))))
+    return [(replicate, index, chunk) for index in range(num_points // chunk) for replicate in range(num_replicates)]
+
+
+def _task_waves(pricer, tasks):
+    """Découpe les lots en vagues simulées d'un bloc (une seule vague sans cible).
+
+    Une vague occupe tous les workers ; en Sobol, elle contient un même nombre de lots par réplication.
+    Le découpage en vagues ne fixe que l'ordonnancement : l'arrêt est testé lot par lot (voir monte_carlo_price).
+    """
+    if getattr(pricer, 'target_std_error', None) is None:
+        return [tasks]
+    size = resolve_workers(getattr(pricer, 'workers', None))
+    if getattr(pricer, 'sampling', 'pseudo') == 'sobol':
+        num_replicates = int(pricer.num_replicates)
+        size = num_replicates * max(1, size // num_replicates)
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+def simulate_task(pricer, task, with_control=False):
+    """Sortie de simulate_terminal pour un lot (replicate, index, n) de simulation_tasks.
+
+    Le lot index est tiré par stream(pricer, index) ; en Sobol, il couvre les points index * n à (index + 1) * n
+    de la suite, décalée par le digital shift de sa réplication.
+    """
+    replicate, index, n = task
+    kwargs = {'with_control': True} if with_control else {}
+    if getattr(pricer, 'sampling', 'pseudo') != 'sobol':
+        return pricer.simulate_terminal(n, rng=stream(pricer, index), **kwargs)
+
+    dimension = pricer.num_factors * pricer.num_steps
+    seed = pricer.seed_sequence
+    engine = copy.deepcopy(_sobol_engine(seed.entropy, seed.spawn_key, dimension))  # Copie : le cache reste intact
+    if index:
+        engine.fast_forward(index * n)
+    shift = stream(pricer, 1 + replicate).integers(0, 2**SOBOL_BITS, dimension, dtype=np.int64)
+    Z = sobol_normals(engine, n, pricer.num_factors, pricer.num_steps, shift)
+    return pricer.simulate_terminal(n, Z=Z, **kwargs)
+
+
+def _terminal_block(pricer, task, with_control=False):
+    simulated = simulate_task(pricer, task, with_control)
+    return np.stack(simulated) if with_control else simulated
+
+
+def _terminal_block_with_control(pricer, task):
+    return _terminal_block(pricer, task, with_control=True)
+
+
+def terminal_values(pricer, with_control=False):
+    """Valeurs terminales de toutes les trajectoires du pricer, sur les mêmes tirages que le pricing.
+
+    Avec with_control=True, tableau (2, n) : sous-jacent puis sous-jacent Black-Scholes de contrôle.
+    En parallèle, les workers écrivent directement dans une mémoire partagée.
+    """
+    tasks = simulation_tasks(pricer)
+    sizes = [n for _, _, n in tasks]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+    shape = (2, sum(sizes)) if with_control else (sum(sizes),)
+    function = _terminal_block_with_control if with_control else _terminal_block
+    return fill_array(function, pricer, tasks, shape, offsets, getattr(pricer, 'workers', None))
+
+
+class RunningStats:
+    """Moyenne et variance cumulées d'échantillons reçus par lots (formule de fusion de Chan et al.).
+
+    Pour des échantillons à plusieurs colonnes (tableau (n, colonnes)), m2 est la matrice des co-moments : covariance
+    donne la matrice de covariance complète et variance sa diagonale. Au-delà de deux dimensions, les moments sont
+    cumulés élément par élément (m2 de même forme que la moyenne, sans co-moments).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Somme des carrés des écarts à la moyenne
+
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=float)
+        n = samples.shape[0]
+        if n == 0:
+            return self
+        batch_mean = samples.mean(axis=0)
+        centered = samples - batch_mean
+        batch_m2 = centered.T @ centered if samples.ndim == 2 else (centered ** 2).sum(axis=0)
+        return self._merge(n, batch_mean, batch_m2)
+
+    def merge(self, other):
+        return self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, n, mean, m2):
+        if n == 0:
+            return self
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        correction = np.multiply.outer(delta, delta) if np.ndim(m2) > np.ndim(mean) else delta * delta
+        self.m2 = self.m2 + m2 + correction * self.count * n / total
+        self.count = total
+        return self
+
+    @property
+    def covariance(self):
+        if self.count < 2:
+            return np.full_like(np.asarray(self.m2, dtype=float), np.nan)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def variance(self):
+        covariance = self.covariance
+        return np.diagonal(covariance).copy() if np.ndim(self.mean) == 1 else covariance
+
+    @property
+    def std_error(self):
+        return np.sqrt(self.variance / self.count)
+
+
+def _pair_average(samples, variance_reduction):
+    """En antithétique, remplace chaque paire (Z, -Z) par sa moyenne : échantillons indépendants pour l'erreur standard."""
+    if 'antithetic' not in variance_reduction:
+        return samples
+    half = samples.shape[0] // 2
+    return 0.5 * (samples[:half] + samples[half:])
+
+
+def _price_statistics(pricer, task):
+    """Statistiques des payoffs (et variables de contrôle) d'un lot : tâche exécutée en série ou par un worker."""
+    methods = pricer.variance_reduction
+    K = pricer.K
+    if 'bs_control_variate' in methods:
+        S_T, S_control = simulate_task(pricer, task, with_control=True)
+        controls = [np.maximum(S_control - K, 0), np.maximum(K - S_control, 0)]
+    else:
+        S_T = simulate_task(pricer, task)
+        controls = [S_T, S_T] if 'control_variate' in methods else []
+    samples = np.stack([np.maximum(S_T - K, 0), np.maximum(K - S_T, 0)] + controls, axis=-1)
+    return RunningStats().update(_pair_average(samples, methods))
+
+
+def monte_carlo_price(pricer):
+    """Prix Call et Put Monte Carlo d'un pricer exposant simulate_terminal(n), avec sa réduction de variance.
+
+    Les erreurs standard des deux prix sont rangées dans pricer.std_errors (dispersion des réplications en Sobol).
+    Variables de contrôle : le pricer fournit expected_terminal() (E[S_T] sous sa dynamique) pour 'control_variate',
+    ou simulate_terminal(n, with_control=True) et control_parameters() (dérive et volatilité Black-Scholes)
+    pour 'bs_control_variate'.
+    """
+    methods = pricer.variance_reduction
+    if 'control_variate' in methods:
+        control_mean = (pricer.expected_terminal(),) * 2
+    elif 'bs_control_variate' in methods:
+        drift, vol = pricer.control_parameters()
+        control_mean = np.exp(drift * pricer.T) * np.array(BS_pricer.price(pricer.S, pricer.K, pricer.T, drift, vol))
+    else:
+        control_mean = None
+
+    target = getattr(pricer, 'target_std_error', None)
+    discount = np.exp(-pricer.r * pricer.T)
+    # L'arrêt adaptatif est testé après chaque lot (chaque tour de réplications en Sobol), dans l'ordre des lots :
+    # le point d'arrêt, donc le prix, ne dépend pas de la taille des vagues (du nombre de workers)
+    step = int(pricer.num_replicates) if getattr(pricer, 'sampling', 'pseudo') == 'sobol' else 1
+    replicates = {}
+    num_paths = 0
+    done = 0
+    converged = False
+    for wave in _task_waves(pricer, simulation_tasks(pricer)):
+        for (replicate, _, n), stats in zip(wave, map_tasks(_price_statistics, pricer, wave,
+                                                           getattr(pricer, 'workers', None))):
+            replicates.setdefault(replicate, RunningStats()).merge(stats)
+            num_paths += n
+            done += 1
+            if target is not None and done % step == 0:
+                price, errors = _estimate(replicates, control_mean)
+                if np.all(discount * errors <= target):
+                    converged = True
+                    break
+        if converged:
+            break
+    if not converged:
+        price, errors = _estimate(replicates, control_mean)
+
+    call_error, put_error = discount * errors
+    pricer.std_errors = (call_error, put_error)
+    pricer.num_paths = num_paths  # Trajectoires effectivement simulées
+    call_price, put_price = discount * price
+    return call_price, put_price
+
+
+def _estimate(replicates, control_mean):
+    """Prix (non actualisés) et erreurs standard à partir des statistiques de chaque réplication."""
+    estimates = [_control_variate_estimate(stats, control_mean) for stats in replicates.values()]
+    if len(estimates) == 1:
+        price, variance, count = estimates[0]
+        return price, np.sqrt(np.maximum(variance, 0) / count)
+    prices = np.array([estimate[0] for estimate in estimates])
+    return prices.mean(axis=0), prices.std(axis=0, ddof=1) / np.sqrt(len(prices))
+
+
+def _scaled_statistics(pricer, task, spots, strikes, step):
+    """Statistiques par case d'un lot remis à l'échelle de chaque (spot, strike) : une RunningStats par tranche de cases.
+
+    Colonnes : payoffs Call et Put puis, avec une variable de contrôle, contrôles Call et Put et sommes payoff +
+    contrôle (dont la variance donne la covariance payoff/contrôle, les moments étant cumulés case par case).
+    Les cases sont traitées par tranches de step cases (même découpage pour tous les lots).
+    """
+    methods = pricer.variance_reduction
+    with_control = 'bs_control_variate' in methods
+    simulated = simulate_task(pricer, task, with_control)
+    growth = (simulated[0] if with_control else simulated) / pricer.S  # Rendements bruts S_T / S_0
+    stats = []
+    for start in range(0, len(spots), step):
+        S, K = spots[start:start + step], strikes[start:start + step]
+        S_T = growth[:, np.newaxis] * S
+        payoffs = [np.maximum(S_T - K, 0), np.maximum(K - S_T, 0)]
+        if 'control_variate' in methods:
+            controls = [S_T, S_T]
+        elif with_control:
+            S_control = simulated[1][:, np.newaxis] / pricer.S * S
+            controls = [np.maximum(S_control - K, 0), np.maximum(K - S_control, 0)]
+        else:
+            controls = []
+        sums = [payoff + control for payoff, control in zip(payoffs, controls)]
+        samples = np.stack(payoffs + controls + sums, axis=-1)  # (trajectoires, cases, colonnes)
+        stats.append(RunningStats().update(_pair_average(samples, methods)))
+    return stats
+
+
+def scaled_prices(pricer, S=None, K=None):
+    """Prix Call et Put pour des tableaux de spots S et de strikes K (broadcastables), sur une seule simulation.
+
+    Réservé aux modèles où S_T est proportionnel à S_0 (attribut scale_invariant) : les trajectoires sont simulées
+    une fois au spot du pricer puis remises à l'échelle. Même estimateur que monte_carlo_price (paires antithétiques,
+    variables de contrôle par réplication) : chaque prix est celui qu'aurait donné le pricer à ce spot et ce strike.
+    Les statistiques par case sont cumulées lot par lot : la mémoire est en O(taille de lot), pas en O(trajectoires
+    x cases), et les lots sont répartis sur les workers comme pour monte_carlo_price.
+    """
+    if not getattr(pricer, 'scale_invariant', False):
+        raise ValueError("Terminal values of this model do not scale with the spot")
+    methods = pricer.variance_reduction
+    S, K = np.broadcast_arrays(np.asarray(pricer.S if S is None else S, dtype=float),
+                               np.asarray(pricer.K if K is None else K, dtype=float))
+    spots, strikes = S.ravel(), K.ravel()
+    if 'control_variate' in methods:
+        control_means = [spots * pricer.expected_terminal() / pricer.S] * 2
+    elif 'bs_control_variate' in methods:
+        drift, vol = pricer.control_parameters()
+        control_means = np.exp(drift * pricer.T) * np.array(BS_pricer.price(spots, strikes, pricer.T, drift, vol))
+    else:
+        control_means = None
+
+    tasks = simulation_tasks(pricer)
+    step = max(1, SCALED_BLOCK_SIZE // max(n for _, _, n in tasks))  # Cases par tranche (mémoire de pointe bornée)
+    replicates = {}
+    for (replicate, _, _), stats in zip(tasks, map_tasks(_scaled_statistics, pricer, tasks,
+                                                         getattr(pricer, 'workers', None), spots, strikes, step)):
+        totals = replicates.setdefault(replicate, [RunningStats() for _ in stats])
+        for total, block in zip(totals, stats):
+            total.merge(block)
+
+    estimates = []
+    for totals in replicates.values():
+        mean = np.concatenate([total.mean for total in totals])
+        m2 = np.concatenate([total.m2 for total in totals])
+        price = mean[:, :2].copy()
+        if control_means is not None:
+            for j in range(2):
+                control_variance = m2[:, 2 + j]
+                covariance = 0.5 * (m2[:, 4 + j] - m2[:, j] - control_variance)
+                b = np.divide(covariance, control_variance, out=np.zeros_like(covariance), where=control_variance > 0)
+                price[:, j] -= b * (mean[:, 2 + j] - control_means[j])
+        estimates.append(price)
+    price = np.exp(-pricer.r * pricer.T) * np.mean(estimates, axis=0)
+    call_price, put_price = (price[:, j].reshape(S.shape) for j in range(2))
+    return call_price[()], put_price[()]
+
+
+def _control_variate_estimate(stats, control_mean):
+    """Moyennes Call et Put corrigées par leur variable de contrôle (colonnes 2 et 3), variances et effectif."""
+    covariance = np.atleast_2d(stats.covariance)
+    price = stats.mean[:2].copy()
+    variance = np.diagonal(covariance)[:2].copy()
+    if control_mean is not None:
+        for j in range(2):
+            control_variance = covariance[2 + j, 2 + j]
+            if control_variance > 0:
+                b = covariance[j, 2 + j] / control_variance
+                price[j] -= b * (stats.mean[2 + j] - control_mean[j])
+                variance[j] -= b * covariance[j, 2 + j]
+    return price, variance, stats.count
+
+
+def _greeks_dicts(delta, gamma, vega, theta):
+    """Met en forme les grecques (paires call, put) en deux dictionnaires."""
+    call_greeks = {'delta': delta[0], 'gamma': gamma[0], 'vega': vega[0], 'theta': theta[0]}
+    put_greeks = {'delta': delta[1], 'gamma': gamma[1], 'vega': vega[1], 'theta': theta[1]}
+    return call_greeks, put_greeks
+
+
+def _reprice(pricer, **changes):
+    """Reprice une copie modifiée du pricer ; la copie partage la graine, donc les tirages.
+
+    L'arrêt adaptatif est désactivé : tous les repricings simulent les mêmes num_simulations trajectoires.
+    """
+    bumped = copy.copy(pricer)
+    bumped.target_std_error = None
+    for name, value in changes.items():
+        setattr(bumped, name, value)
+    return np.array(bumped.get_european_option())
+
+
+def finite_difference_greeks(pricer, vol_param, spot_bump=1e-2, vol_bump=1e-3, time_bump=1e-3, pathwise=False,
+                             delta_gamma=None):
+    """Grecques par différences centrées, toutes calculées sur les mêmes tirages aléatoires.
+
+    vol_param est l'attribut du pricer dont vega est la sensibilité. theta = -dV/dT (par an).
+    Avec pathwise=True, delta et gamma viennent de pathwise_greeks, sur la même simulation que le prix.
+    delta_gamma fournit directement les paires (call, put) de delta et de gamma (par exemple lues sur une grille EDP).
+    """
+    S, T, vol = pricer.S, pricer.T, getattr(pricer, vol_param)
+    dS = spot_bump * S
+    dT = min(time_bump, 0.5 * T)
+
+    if delta_gamma is not None:
+        delta, gamma = (np.array(x) for x in delta_gamma)
+    elif pathwise:
+        delta, gamma = pathwise_greeks(pricer, spot_bump)
+    else:
+        base = _reprice(pricer)
+        up = _reprice(pricer, S=S + dS)
+        down = _reprice(pricer, S=S - dS)
+        delta = (up - down) / (2 * dS)
+        gamma = (up - 2 * base + down) / dS**2
+    vega = (_reprice(pricer, **{vol_param: vol + vol_bump})
+            - _reprice(pricer, **{vol_param: vol - vol_bump})) / (2 * vol_bump)
+    theta = (_reprice(pricer, T=T - dT) - _reprice(pricer, T=T + dT)) / (2 * dT)
+    return _greeks_dicts(delta, gamma, vega, theta)
+
+
+def _pathwise_statistics(pricer, task, spot_bump):
+    S, K = pricer.S, pricer.K
+    dS = spot_bump * S
+    X = simulate_task(pricer, task) / S  # Rendement brut S_T / S_0
+    return RunningStats().update(np.stack([X * (S * X > K), X,
+                                           X * ((S + dS) * X > K), X * ((S - dS) * X > K)], axis=-1))
+
+
+def pathwise_greeks(pricer, spot_bump=1e-2):
+    """Delta pathwise et gamma pour les modèles où S_T est proportionnel à S_0 (Heston, Merton, Variance Gamma).
+
+    delta = exp(-rT) E[1{S_T > K} S_T / S_0] ; gamma est la différence centrée de cet estimateur,
+    évalué sur les mêmes trajectoires remises à l'échelle S_0 +/- h (aucune simulation supplémentaire).
+    Consomme exactement les tirages de get_european_option.
+    """
+    dS = spot_bump * pricer.S
+    stats = RunningStats()
+    for batch_stats in map_tasks(_pathwise_statistics, pricer, simulation_tasks(pricer),
+                                 getattr(pricer, 'workers', None), spot_bump):
+        stats.merge(batch_stats)
+    in_the_money, growth, itm_up, itm_down = np.exp(-pricer.r * pricer.T) * stats.mean
+    delta = (in_the_money, in_the_money - growth)
+    gamma = ((itm_up - itm_down) / (2 * dS),) * 2
+    return delta, gamma
@@ -0,0 +1,115 @@
+import atexit
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Exécution des lots Monte Carlo sur un pool de processus
+# Chaque lot est un flux aléatoire indépendant (monte_carlo.stream) : le simuler dans un autre processus donne exactement
+# les mêmes tirages qu'en série, et les résultats sont recombinés dans l'ordre des lots. Le découpage en lots ne dépend
+# pas du nombre de workers (monte_carlo.simulation_tasks) : les prix sont identiques au bit près en série et en parallèle.
+# Seules de petites statistiques (effectif, moyenne, co-moments) reviennent par pickle ; les gros tableaux
+# (valeurs terminales de toutes les trajectoires) sont écrits directement par les workers dans une mémoire partagée.
+# Si le pool est inutilisable (un seul worker, pricer non picklable comme une surface définie par une lambda,
+# création de processus impossible), le calcul se fait en série.
+
+_executors = {}  # Pools réutilisés d'un appel à l'autre, par nombre de workers
+
+
+def resolve_workers(workers):
+    """Nombre de processus : None ou 1 pour un calcul en série, -1 pour tous les coeurs."""
+    if workers is None:
+        return 1
+    workers = int(workers)
+    if workers == -1:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be a positive integer, -1 or None")
+    return workers
+
+
+def _executor(workers):
+    if workers not in _executors:
+        _executors[workers] = ProcessPoolExecutor(max_workers=workers)
+    return _executors[workers]
+
+
+@atexit.register
+def shutdown():
+    """Arrête les pools de processus ouverts."""
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
+
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+
+def map_tasks(function, pricer, tasks, workers=None, *args):
+    """[function(pricer, task, *args) for task in tasks], réparti sur un pool de processus quand c'est possible.
+
+    function doit être définie au niveau d'un module. L'ordre des résultats est celui des tâches.
+    """
+    workers = resolve_workers(workers)
+    if workers > 1 and len(tasks) > 1 and _picklable(pricer):
+        try:
+            executor = _executor(workers)
+            return list(executor.map(function, repeat(pricer), tasks, *(repeat(arg) for arg in args)))
+        except (BrokenProcessPool, OSError):
+            _executors.pop(workers, None)
+    return [function(pricer, task, *args) for task in tasks]
+
+
+def _attach(name):
+    """Ouvre un segment de mémoire partagée créé par le processus parent, sans le confier au resource tracker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 : l'ouverture enregistre le segment, qui serait détruit à la sortie du worker
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+def _write_block(pricer, task, function, name, shape, offset):
+    segment = _attach(name)
+    try:
+        block = function(pricer, task)
+        out = np.ndarray(shape, dtype=float, buffer=segment.buf)
+        out[..., offset:offset + block.shape[-1]] = block
+        del out
+    finally:
+        segment.close()
+
+
+def fill_array(function, pricer, tasks, shape, offsets, workers=None):
+    """Tableau de forme shape dont function(pricer, task) fournit le bloc [..., offset:offset + n] de chaque tâche.
+
+    En parallèle, les workers écrivent leurs blocs dans une mémoire partagée : rien de volumineux n'est picklé.
+    """
+    workers = resolve_workers(workers)
+    if workers > 1 and len(tasks) > 1 and _picklable(pricer):
+        segment = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+        try:
+            executor = _executor(workers)
+            list(executor.map(_write_block, repeat(pricer), tasks, repeat(function), repeat(segment.name),
+                              repeat(shape), offsets))
+            return np.ndarray(shape, dtype=float, buffer=segment.buf).copy()
+        except (BrokenProcessPool, OSError):
+            _executors.pop(workers, None)
+        finally:
+            segment.close()
+            segment.unlink()
+    out = np.empty(shape)
+    for task, offset in zip(tasks, offsets):
+        block = function(pricer, task)
+        out[..., offset:offset + block.shape[-1]] = block
+    return out
@@ -0,0 +1,167 @@
+import numpy as np
+from scipy.interpolate import CubicSpline
+from scipy.linalg import solve_banded
+
+# Pricing par différences finies (schéma de Crank-Nicolson)
+# Moteur commun aux modèles à volatilité déterministe : volatilité constante (Black-Scholes) ou locale sigma(S, t)
+# (Dupire). L'EDP dV/dtau = 0.5 sigma^2 S^2 V_SS + r S V_S - r V est résolue en temps rétrograde tau = T - t
+# sur une grille uniforme en S, dont un noeud tombe sur le strike ; chaque pas est un système tridiagonal (solve_banded).
+# Les premiers pas sont totalement implicites (Rannacher) pour amortir les oscillations dues au coude du payoff.
+# Une seule résolution donne les prix sur tout l'axe des spots : les spots demandés sont obtenus par interpolation,
+# delta et gamma par différences finies sur la grille.
+# Plusieurs strikes (K tableau, broadcastable avec S) : une grille et une résolution par strike distinct.
+# Exercice américain : méthode de pénalisation (Forsyth-Vetzal), la contrainte V >= payoff est imposée par un terme
+# de pénalité sur les noeuds où elle est violée, jusqu'à stabilisation de l'ensemble d'exercice.
+
+
+class PDE_pricer:
+    def __init__(self, volatility, S, K, T, r, num_space=800, num_time=200, S_max=None, rannacher_steps=2,
+                 penalty=1e8, max_penalty_iter=50):
+        self.volatility = volatility  # Volatilité constante, ou fonction (S, t) appelée sur des tableaux
+        self.S = S                    # Prix de l'actif sous-jacent (scalaire ou tableau de spots)
+        if np.any(np.asarray(K) <= 0):
+            raise ValueError("Strike K must be positive")
+        self.K = K                    # Prix d'exercice (scalaire ou tableau de strikes)
+        if T <= 0:
+            raise ValueError("Maturity T must be positive")
+        self.T = T                    # Maturité
+        self.r = r                    # Taux sans risque
+        self.num_time = num_time      # Nombre de pas de temps
+        self.rannacher_steps = rannacher_steps  # Pas initiaux totalement implicites
+        self.penalty = penalty        # Coefficient de pénalisation de l'exercice anticipé
+        self.max_penalty_iter = max_penalty_iter  # Itérations maximales de pénalisation par pas de temps
+
+        # Plusieurs strikes : un pricer par strike distinct, aux spots S broadcastés sur les strikes
+        self._strike_pricers = None
+        if np.ndim(K):
+            spots = np.broadcast_arrays(np.asarray(S, dtype=float), np.asarray(K, dtype=float))[0]
+            self._strike_pricers = {k: PDE_pricer(volatility, spots, k, T, r, num_space, num_time, S_max,
+                                                  rannacher_steps, penalty, max_penalty_iter)
+                                    for k in np.unique(np.asarray(K, dtype=float))}
+            return
+
+        # Grille en S : borne haute à environ 5 écarts-types au-delà du plus grand spot ou du strike
+        if S_max is None:
+            vol = float(np.mean(self.local_vol(np.asarray(K, dtype=float), 0.0)))
+            S_max = max(np.max(S), K) * max(np.exp(5 * vol * np.sqrt(T)), 2.0)
+        nodes_to_strike = max(int(round(num_space * K / S_max)), 1)
+        self.dS = K / nodes_to_strike
+        self.S_grid = self.dS * np.arange(int(np.ceil(S_max / self.dS)) + 1)
+        self._solutions = {}
+
+    def local_vol(self, S, t):
+        if callable(self.volatility):
+            return np.broadcast_to(self.volatility(S, t), np.shape(S))
+        return np.full(np.shape(S), float(self.volatility))
+
+    def _operator(self, t):
+        """Coefficients (V_{i-1}, V_i, V_{i+1}) de l'opérateur de Black-Scholes discrétisé au temps t."""
+        S = self.S_grid
+        # En S = 0 le terme de diffusion est nul : la volatilité y est lue au premier noeud (surfaces en ln S)
+        vol = self.local_vol(np.maximum(S, S[1]), t)
+        diffusion = 0.5 * vol**2 * S**2 / self.dS**2
+        drift = 0.5 * self.r * S / self.dS
+        return diffusion - drift, -2 * diffusion - self.r, diffusion + drift
+
+    def _boundary(self, tau):
+        """Valeurs Call et Put en S_max (conditions de Dirichlet)."""
+        return np.array([self.S_grid[-1] - self.K * np.exp(-self.r * tau), 0.0])
+
+    def _per_strike(self, function):
+        """Sorties de function(pricer) (tableaux aux spots) pour chaque strike distinct, recomposées case par case."""
+        K = np.broadcast_arrays(np.asarray(self.S, dtype=float), np.asarray(self.K, dtype=float))[1]
+        results = None
+        for k, pricer in self._strike_pricers.items():
+            values = function(pricer)
+            if results is None:
+                results = [np.empty(K.shape) for _ in values]
+            for result, value in zip(results, values):
+                result[K == k] = np.asarray(value)[K == k]
+        return [result[()] for result in results]
+
+    def solve(self, american=False):
+        """Valeurs Call et Put en t = 0 sur tout S_grid : tableau (len(S_grid), 2)."""
+        if self._strike_pricers is not None:
+            raise ValueError("The solution grid is defined for a single strike")
+        if american in self._solutions:
+            return self._solutions[american]
+        S, K = self.S_grid, self.K
+        payoff = np.stack([np.maximum(S - K, 0), np.maximum(K - S, 0)], axis=-1)
+        values = payoff.copy()
+        dtau = self.T / self.num_time
+        matrix = np.zeros((3, len(S)))
+        for n in range(self.num_time):
+            theta = 1.0 if n < self.rannacher_steps else 0.5
+            lower, diag, upper = self._operator(self.T - (n + 0.5) * dtau)
+
+            # Second membre : partie explicite du schéma, puis condition aux limites en S_max
+            rhs = values.copy()
+            if theta < 1:
+                operator_values = diag[:, np.newaxis] * values
+                operator_values[1:] += lower[1:, np.newaxis] * values[:-1]
+                operator_values[:-1] += upper[:-1, np.newaxis] * values[1:]
+                rhs += (1 - theta) * dtau * operator_values
+            rhs[-1] = self._boundary((n + 1) * dtau)
+
+            # Matrice tridiagonale I - theta dtau L au format de solve_banded
+            matrix[0, 1:] = -theta * dtau * upper[:-1]
+            matrix[1] = 1 - theta * dtau * diag
+            matrix[2, :-1] = -theta * dtau * lower[1:]
+            matrix[1, -1], matrix[2, -2] = 1.0, 0.0
+
+            if american:
+                values = np.stack([self._penalized_solve(matrix, rhs[:, j], payoff[:, j], values[:, j])
+                                   for j in range(2)], axis=-1)
+            else:
+                values = solve_banded((1, 1), matrix, rhs)
+        self._solutions[american] = values
+        return values
+
+    def _penalized_solve(self, matrix, rhs, payoff, guess):
+        """Résout matrix V = rhs sous la contrainte V >= payoff par pénalisation itérée."""
+        active = guess < payoff
+        penalized = matrix.copy()
+        for _ in range(self.max_penalty_iter):
+            penalty = np.where(active, self.penalty, 0.0)
+            penalized[1] = matrix[1] + penalty
+            values = solve_banded((1, 1), penalized, rhs + penalty * payoff)
+            new_active = values < payoff
+            if np.array_equal(new_active, active):
+                break
+            active = new_active
+        return values
+
+    def get_spot_grid(self, american=False):
+        """Prix Call et Put sur toute la grille de spots, en une seule résolution."""
+        values = self.solve(american)
+        return self.S_grid, values[:, 0], values[:, 1]
+
+    def _interpolate(self, values):
+        S = np.asarray(self.S, dtype=float)
+        result = CubicSpline(self.S_grid, values)(S)
+        return result[..., 0][()], result[..., 1][()]
+
+    def get_european_option(self):
+        if self._strike_pricers is not None:
+            return tuple(self._per_strike(PDE_pricer.get_european_option))
+        return self._interpolate(self.solve(american=False))
+
+    def get_american_option(self):
+        if self._strike_pricers is not None:
+            return tuple(self._per_strike(PDE_pricer.get_american_option))
+        return self._interpolate(self.solve(american=True))
+
+    def get_greeks(self, american=False):
+        """Delta et gamma Call et Put aux spots demandés, par différences finies sur la grille de la solution."""
+        if self._strike_pricers is not None:
+            delta_call, gamma_call, delta_put, gamma_put = self._per_strike(
+                lambda pricer: [greeks[name] for greeks in pricer.get_greeks(american) for name in ('delta', 'gamma')])
+            return {'delta': delta_call, 'gamma': gamma_call}, {'delta': delta_put, 'gamma': gamma_put}
+        values = self.solve(american)
+        delta = np.gradient(values, self.dS, axis=0)
+        gamma = np.zeros_like(values)
+        gamma[1:-1] = (values[2:] - 2 * values[1:-1] + values[:-2]) / self.dS**2
+        gamma[0], gamma[-1] = gamma[1], gamma[-2]
+        delta_call, delta_put = self._interpolate(delta)
+        gamma_call, gamma_put = self._interpolate(gamma)
+        return {'delta': delta_call, 'gamma': gamma_call}, {'delta': delta_put, 'gamma': gamma_put}
@@ -1,11 +1,111 @@
 import numpy as np
+from scipy.optimize import least_squares
 from scipy.stats import norm
 
 # Modèle SABR (Stochastic Alpha Beta Rho)
 # Utilisé pour modéliser la volatilité implicite des options, en particulier pour les marchés des taux d'intérêt et des matières premières.
 # Il est capable de capturer le "smile" de volatilité et permet de modéliser des dynamiques de volatilité stochastique.
 # Particulièrement utilisé dans les marchés où la volatilité dépend du prix du sous-jacent et évolue dans le temps.
+# La formule de Hagan est vectorisée sur F, K et T (tout un smile en un appel) et sa jacobienne analytique
+# en (alpha, rho, nu) sert à la calibration rapide d'une tranche de maturité (calibrate_sabr).
+
+
+def _z_over_x(z, rho):
+    """z / x(z) de la formule de Hagan et ses dérivées en z et en rho.
+
+    Développement limité à l'ordre 3 près de la monnaie (|z| < 1e-3), où la forme exacte perd en précision.
+    """
+    small = np.abs(z) < 1e-3
+    z_safe = np.where(small, 1.0, z)
+    y = np.sqrt(1 - 2 * rho * z_safe + z_safe ** 2)
+    # x(z) = ln((y + z - rho) / (1 - rho)), écrit avec log1p pour éviter l'annulation y - 1
+    x = np.log1p((z_safe + (z_safe ** 2 - 2 * rho * z_safe) / (y + 1)) / (1 - rho))
+    x_rho = -(z_safe / y + 1) / (y + z_safe - rho) + 1 / (1 - rho)
+    zeta = z_safe / x
+    zeta_z = (x - z_safe / y) / x ** 2
+    zeta_rho = -z_safe * x_rho / x ** 2
+
+    c2 = 1 / 6 - rho ** 2 / 4
+    c3 = 5 * rho / 24 - rho ** 3 / 4
+    zeta = np.where(small, 1 - rho * z / 2 + c2 * z ** 2 + c3 * z ** 3, zeta)
+    zeta_z = np.where(small, -rho / 2 + 2 * c2 * z + 3 * c3 * z ** 2, zeta_z)
+    zeta_rho = np.where(small, -z / 2 - rho * z ** 2 / 2 + (5 / 24 - 3 * rho ** 2 / 4) * z ** 3, zeta_rho)
+    return zeta, zeta_z, zeta_rho
+
+
+def hagan_volatility(F, K, T, alpha, beta, rho, nu, jacobian=False):
+    """Volatilité implicite SABR de Hagan et al. (2002), vectorisée sur F, K et T.
+
+    Continue à la monnaie (pas de cas particulier F == K). F ou K non positifs donnent NaN.
+    Avec jacobian=True, renvoie aussi les dérivées analytiques en (alpha, rho, nu), empilées sur le dernier axe.
+    """
+    F, K, T = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (F, K, T)))
+    valid = (F > 0) & (K > 0)
+    F, K = np.where(valid, F, 1.0), np.where(valid, K, 1.0)
+    log_FK = np.log(F / K)
+    FK_beta = (F * K) ** ((1 - beta) / 2)
+    one_beta_2 = (1 - beta) ** 2
+    D = FK_beta * (1 + one_beta_2 / 24 * log_FK ** 2 + one_beta_2 ** 2 / 1920 * log_FK ** 4)
+    z = nu / alpha * FK_beta * log_FK
+    zeta, zeta_z, zeta_rho = _z_over_x(z, rho)
+
+    a1 = one_beta_2 / 24 / FK_beta ** 2
+    a2 = beta / (4 * FK_beta)
+    B = 1 + (a1 * alpha ** 2 + a2 * rho * nu * alpha + (2 - 3 * rho ** 2) * nu ** 2 / 24) * T
+    level = alpha / D
+    vol = np.where(valid, level * zeta * B, np.nan)
+    if not jacobian:
+        return vol[()]
+
+    vol_alpha = vol / alpha - level * B * zeta_z * z / alpha + level * zeta * (2 * a1 * alpha + a2 * rho * nu) * T
+    vol_rho = level * (B * zeta_rho + zeta * (a2 * nu * alpha - rho * nu ** 2 / 4) * T)
+    vol_nu = level * (B * zeta_z * z / nu + zeta * (a2 * rho * alpha + (2 - 3 * rho ** 2) * nu / 12) * T)
+    return vol[()], np.stack([vol_alpha, vol_rho, vol_nu], axis=-1)
+
+
+def calibrate_sabr(F, strikes, T, market_vols, beta, initial_guess=None, weights=None):
+    """Calibre (alpha, rho, nu) d'une tranche de maturité sur un smile de marché, beta étant fixé.
+
+    Moindres carrés sur les volatilités (pondérées par weights) avec la jacobienne analytique de hagan_volatility.
+    initial_guess permet de repartir de la calibration précédente. Renvoie un dictionnaire avec les paramètres,
+    l'erreur RMS (non pondérée, sur les quotes de poids positif), les nombres d'itérations et d'évaluations et le
+    statut de convergence.
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    market_vols = np.asarray(market_vols, dtype=float)
+    weights = np.ones_like(market_vols) if weights is None else np.asarray(weights, dtype=float)
+    if initial_guess is None:
+        order = np.argsort(strikes)
+        atm_vol = np.interp(F, strikes[order], market_vols[order])
+        initial_guess = (atm_vol * F ** (1 - beta), 0.0, 0.5)
+
+    def residuals(params):
+        alpha, rho, nu = params
+        return weights * (hagan_volatility(F, strikes, T, alpha, beta, rho, nu) - market_vols)
+
+    def jacobian(params):
+        alpha, rho, nu = params
+        return weights[:, np.newaxis] * hagan_volatility(F, strikes, T, alpha, beta, rho, nu, jacobian=True)[1]
+
+    result = least_squares(residuals, initial_guess, jac=jacobian, method='trf', x_scale='jac',
+                           bounds=([1e-8, -0.9999, 1e-8], [np.inf, 0.9999, np.inf]))
+    alpha, rho, nu = result.x
+    quoted = weights > 0  # Un poids nul retire la quote
+    errors = hagan_volatility(F, strikes[quoted], T, alpha, beta, rho, nu) - market_vols[quoted]
+    return {
+        'alpha': alpha,
+        'rho': rho,
+        'nu': nu,
+        'rmse': np.sqrt(np.mean(errors ** 2)),
+        'iterations': result.njev,
+        'function_evaluations': result.nfev,
+        'success': result.success,
+    }
+
+
 class SABR_pricer:
+    r = 0.05  # Taux d'actualisation du strike dans get_european_option
+
     def __init__(self, S, K, T, alpha, beta, rho, nu):
         self.S = S          # Prix actuel du sous-jacent
         self.K = K          # Prix d'exercice (strike)
@@ -24,50 +124,56 @@ class SABR_pricer:
         self.nu = nu        # Volatilité de la volatilité
 
     def sabr_volatility(self):
-        F = self.S
-        K = self.K
-
-        if F <= 0 or K <= 0:
-            raise ValueError("F and K must be positive")
-
-        if F == K:
-            # Cas où K est égal à F (Prix forward)
-            term1 = ((1 - self.beta) ** 2 / 24) * (self.alpha ** 2 / F ** (2 - 2 * self.beta)) * self.T
-            term2 = (self.rho * self.beta * self.nu * self.alpha) / (4 * F ** (1 - self.beta)) * self.T
-            term3 = (2 - 3 * self.rho ** 2) * (self.nu ** 2 / 24) * self.T
-            V = self.alpha * (1 + term1 + term2 + term3)
-        else:
-            logFK = np.log(F / K)
-            FK_beta = (F * K) ** ((1 - self.beta) / 2)
-            z = (self.nu / self.alpha) * FK_beta * logFK
-            x_z_numerator = np.sqrt(1 - 2 * self.rho * z + z ** 2) + z - self.rho
-            x_z_denominator = 1 - self.rho
-            if x_z_denominator == 0 or x_z_numerator <= 0:
-                raise ValueError("Invalid parameters leading to division by zero or logarithm of non-positive number in x_z calculation.")
-            x_z = np.log(x_z_numerator / x_z_denominator)
-
-            A = self.alpha / (FK_beta * (1 + ((1 - self.beta) ** 2 / 24) * logFK ** 2
-                                         + ((1 - self.beta) ** 4 / 1920) * logFK ** 4))
-
-            B = 1 + (((1 - self.beta) ** 2 / 24) * (self.alpha ** 2) / (F * K) ** (1 - self.beta)
-                     + 0.25 * self.rho * self.beta * self.nu * self.alpha / FK_beta
-                     + (2 - 3 * self.rho ** 2) * (self.nu ** 2 / 24)) * self.T
-
-            if x_z == 0:
-                raise ValueError("x_z equals zero, leading to division by zero in volatility calculation.")
-
-            V = A * z / x_z * B
-
-        return V
+        return hagan_volatility(self.S, self.K, self.T, self.alpha, self.beta, self.rho, self.nu)
 
     def get_european_option(self):
         vol = self.sabr_volatility()
-        if vol <= 0:
+        if not np.all(vol > 0):
             raise ValueError("Calculated volatility is non-positive.")
         d1 = (np.log(self.S / self.K) + (0.5 * vol ** 2) * self.T) / (vol * np.sqrt(self.T))
         d2 = d1 - vol * np.sqrt(self.T)
 
-        call_price = self.S * norm.cdf(d1) - self.K * np.exp(-0.05 * self.T) * norm.cdf(d2)
-        put_price = self.K * np.exp(-0.05 * self.T) * norm.cdf(-d2) - self.S * norm.cdf(-d1)
+        call_price = self.S * norm.cdf(d1) - self.K * np.exp(-self.r * self.T) * norm.cdf(d2)
+        put_price = self.K * np.exp(-self.r * self.T) * norm.cdf(-d2) - self.S * norm.cdf(-d1)
+
+        return call_price, put_price
+
+    def get_greeks(self, spot_bump=1e-4, time_bump=1e-4):
+        """Grecques Call et Put (delta, gamma, vega par rapport à la volatilité SABR, theta).
+
+        Dérivées fermées de la formule de get_european_option, composées avec la sensibilité de la volatilité SABR
+        au spot et à la maturité (effet smile), obtenue par différences centrées sur la formule de Hagan.
+        """
+        S, K, T = self.S, self.K, self.T
+        vol = self.sabr_volatility()
+        dS = spot_bump * S
+        dT = time_bump * T
+        params = (self.alpha, self.beta, self.rho, self.nu)
+        vol_up, vol_down = hagan_volatility(S + dS, K, T, *params), hagan_volatility(S - dS, K, T, *params)
+        vol_S = (vol_up - vol_down) / (2 * dS)
+        vol_SS = (vol_up - 2 * vol + vol_down) / dS ** 2
+        vol_T = (hagan_volatility(S, K, T + dT, *params) - hagan_volatility(S, K, T - dT, *params)) / (2 * dT)
+
+        sqrt_T = np.sqrt(T)
+        a = vol * sqrt_T
+        d1 = (np.log(S / K) + 0.5 * vol ** 2 * T) / a
+        d2 = d1 - a
+        pdf_d1 = norm.pdf(d1)
+        discount = np.exp(-self.r * T)
+        # Dérivées partielles du Call à volatilité fixée (K * n(d2) = S * n(d1) car la formule n'a pas de dérive)
+        C_S = norm.cdf(d1) + pdf_d1 * (1 - discount) / a
+        C_SS = pdf_d1 / (S * a) * (1 - d1 * (1 - discount) / a)
+        C_v = S * pdf_d1 / vol * (discount * d1 - d2)
+        C_Sv = pdf_d1 / vol * (-d2 + (1 - discount) * (d1 * d2 - 1) / a)
+        C_vv = S * pdf_d1 / vol ** 2 * ((discount * d1 - d2) * (d1 * d2 - 1) + d1 - discount * d2)
+        d1_T = -np.log(S / K) / (2 * vol * T * sqrt_T) + vol / (4 * sqrt_T)
+        d2_T = d1_T - vol / (2 * sqrt_T)
+        C_T = S * pdf_d1 * (d1_T - discount * d2_T) + self.r * K * discount * norm.cdf(d2)
 
-        return call_price, put_price
\ No newline at end of file
+        delta = C_S + C_v * vol_S
+        gamma = C_SS + 2 * C_Sv * vol_S + C_vv * vol_S ** 2 + C_v * vol_SS
+        theta = -(C_T + C_v * vol_T)
+        call_greeks = {'delta': delta, 'gamma': gamma, 'vega': C_v, 'theta': theta}
+        # Parité Call-Put : P = C - S + K * exp(-rT)
+        put_greeks = {'delta': delta - 1, 'gamma': gamma, 'vega': C_v, 'theta': theta + self.r * K * discount}
+        return call_greeks, put_greeks
\ No newline at end of file
@@ -1,11 +1,22 @@
 import numpy as np
+from scipy.special import gammaincinv
+
+from option_class.fft_pricer import FFT_pricer
+from option_class.monte_carlo import (finite_difference_greeks, monte_carlo_price, parse_variance_reduction, seed_sequence,
+                                      standard_normal, stream, uniform)
 
 # Modèle Variance Gamma
 # Utilisé pour modéliser des sous-jacents où la distribution des rendements présente des queues épaisses et une asymétrie. Le modèle repose sur un processus gamma.
 # Particulièrement utilisé dans des marchés avec une distribution des rendements non gaussienne, comme les actions et matières premières.
+# Méthodes : 'mc' (Monte Carlo) ou 'fft' (Carr-Madan sur la fonction caractéristique), toutes deux sous la mesure
+# risque-neutre.
 
 class VG_pricer:
-    def __init__(self, S, K, T, r, sigma, theta, nu, num_simulations=10000):
+    scale_invariant = True  # S_T proportionnel à S_0 : une simulation sert tous les spots
+
+    def __init__(self, S, K, T, r, sigma, theta, nu, num_simulations=10000, method='mc', batch_size=None,
+                 variance_reduction=None, seed=None, workers=None,
+                 target_std_error=None):
         self.S = S          # Prix de l'actif sous-jacent
         self.K = K          # Prix d'exercice
         self.T = T          # Maturité
@@ -13,22 +24,58 @@ class VG_pricer:
         self.sigma = sigma  # Volatilité
         self.theta = theta  # Skewness du processus gamma
         self.nu = nu        # Paramètre de variance gamma
+        if theta * nu + 0.5 * sigma**2 * nu >= 1:
+            raise ValueError("VG parameters must satisfy theta * nu + sigma^2 * nu / 2 < 1")
         self.num_simulations = num_simulations  # Nombre de simulations Monte Carlo
+        if method not in ('mc', 'fft'):
+            raise ValueError("Method must be 'mc' or 'fft'")
+        self.method = method  # Méthode de pricing
+        self.batch_size = batch_size  # Nombre maximal de trajectoires simulées à la fois (mémoire de pointe)
+        # Techniques de réduction de variance (pas de contrôle Black-Scholes : le brownien est subordonné au temps gamma)
+        self.variance_reduction = parse_variance_reduction(
+            variance_reduction, allowed=('antithetic', 'moment_matching', 'control_variate'))
+        self.seed_sequence = seed_sequence(seed)  # Graine des flux aléatoires (entier, SeedSequence ou Generator)
+        self.workers = workers  # Processus utilisés pour simuler les lots (None : série, -1 : tous les coeurs)
+        self.target_std_error = target_std_error  # Erreur standard visée (arrêt adaptatif)
+        self.std_errors = None  # Erreurs standard Call et Put du dernier pricing Monte Carlo
+        self.num_paths = None  # Trajectoires simulées lors du dernier pricing Monte Carlo
 
-    def get_european_option(self):
-        S_paths = np.zeros(self.num_simulations)
-        S_paths.fill(self.S)
+    def characteristic_function(self, u):
+        """Fonction caractéristique de ln(S_T / S_0) sous la mesure risque-neutre."""
+        return (np.exp(1j * u * (self.r + self.martingale_correction()) * self.T)
+                * (1 - 1j * u * self.theta * self.nu + 0.5 * self.sigma**2 * self.nu * u**2) ** (-self.T / self.nu))
+
+    def martingale_correction(self):
+        """omega = ln(1 - theta nu - sigma^2 nu / 2) / nu, tel que S_0 exp((r + omega) t + X_t) actualisé soit une martingale."""
+        return np.log(1 - self.theta * self.nu - 0.5 * self.sigma**2 * self.nu) / self.nu
 
-        for i in range(self.num_simulations):
-            gamma = np.random.gamma(self.T / self.nu, self.nu, 1)
-            S_paths[i] *= np.exp((self.r + self.theta) * self.T +
-                                 gamma * (self.theta - 0.5 * self.sigma**2) + 
-                                 self.sigma * np.random.normal(0, np.sqrt(gamma)))
+    def simulate_terminal(self, n, rng=None):
+        """Simule n valeurs terminales du sous-jacent sous la mesure risque-neutre, en une passe vectorisée, tirées par rng.
 
-        call_payoff = np.maximum(S_paths - self.K, 0)
-        put_payoff = np.maximum(self.K - S_paths, 0)
+        S_T = S_0 exp((r + omega) T + theta G + sigma sqrt(G) Z), G temps gamma : même loi que la fonction
+        caractéristique de la méthode 'fft'.
+        Le temps gamma est tiré par inversion de la fonction de répartition : à tirages égaux, il est croissant en T,
+        ce qui garde les grecques à nombres aléatoires communs stables. En antithétique, son uniforme est apparié
+        comme les gaussiennes (U et 1 - U).
+        """
+        rng = stream(self) if rng is None else rng
+        gamma = self.nu * gammaincinv(self.T / self.nu, uniform(rng, n, self.variance_reduction))  # Temps gamma
+        Z = standard_normal(rng, n, self.variance_reduction)
+        return self.S * np.exp((self.r + self.martingale_correction()) * self.T + self.theta * gamma +
+                               self.sigma * np.sqrt(gamma) * Z)
+
+    def expected_terminal(self):
+        """E[S_T] = S_0 exp(rT) sous la dynamique simulée (risque-neutre), espérance de la variable de contrôle S_T."""
+        return self.S * np.exp(self.r * self.T)
+
+    def get_european_option(self):
+        if self.method == 'fft':
+            return FFT_pricer(self.characteristic_function, self.S, self.K, self.T, self.r).get_european_option()
+        return monte_carlo_price(self)
 
-        call_price = np.exp(-self.r * self.T) * np.mean(call_payoff)
-        put_price = np.exp(-self.r * self.T) * np.mean(put_payoff)
+    def get_greeks(self):
+        """Grecques Call et Put (delta, gamma, vega en sigma, theta).
 
-        return call_price, put_price
\ No newline at end of file
+        En Monte Carlo : delta et gamma pathwise, vega et theta par différences centrées à nombres aléatoires communs.
+        """
+        return finite_difference_greeks(self, 'sigma', pathwise=self.method == 'mc')
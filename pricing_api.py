@@ -0,0 +1,160 @@
+import inspect
+import json
+from functools import lru_cache
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from option_class.batch import iter_price_batch
+from option_class.grid import MODELS
+
+# API JSON de pricing par lots, servie par le serveur Flask de l'application
+# POST /api/price avec {"requests": [{"model": "BS", "params": {"S": 100, ...}, "id": ...}, ...], "greeks": false}
+# Chaque demande donne les arguments du constructeur du pricer de son modèle (BS, BINOMIAL, SABR, HESTON, MERTON, VG,
+# DUPIRE ; pour DUPIRE, local_vol_surface est une volatilité constante). Les demandes sont regroupées par modèle et
+# pricées par les chemins vectorisés (option_class.batch) ; les résultats reviennent dans l'ordre des demandes,
+# avec l'id éventuel de chaque demande et un message d'erreur pour celles qui n'ont pas pu être pricées.
+# Avec "stream": true (ou ?stream=1), la réponse est en NDJSON (une ligne JSON par résultat), envoyée par paquets
+# au fil du calcul : pour les très gros lots, ni le serveur ni le client n'ont à tenir toute la réponse en mémoire.
+# Limites : taille du corps, nombre de demandes, paramètres de calcul (trajectoires, pas, grilles) par demande, plus
+# bas pour les demandes avec grecques, et coût total du lot (trajectoires x pas de temps, ou taille de la grille,
+# sommés sur les demandes et multipliés par le nombre de repricings des grecques) : un lot trop coûteux reçoit un 413.
+# Seuls les arguments du constructeur du modèle sont acceptés, avec des valeurs scalaires ; les paramètres d'exécution
+# (processus, taille des lots) et les grilles de tabulation sont fixés par le serveur, pas par le client.
+
+MAX_CONTENT_LENGTH = 16 * 2**20      # Taille maximale du corps de la requête (octets)
+MAX_BATCH_SIZE = 10000               # Demandes par réponse JSON
+MAX_STREAM_BATCH_SIZE = 200000       # Demandes par réponse en streaming
+MAX_GREEKS_BATCH_SIZE = 1000         # Demandes avec grecques (plusieurs repricings chacune)
+STREAM_CHUNK_SIZE = 1000             # Demandes pricées entre deux envois en streaming
+PARAMETER_LIMITS = {                 # Bornes des paramètres qui fixent le coût d'un pricing
+    'num_simulations': 10**6,
+    'num_steps': 2000,
+    'steps': 5000,
+    'num_space': 10000,
+    'num_replicates': 64,
+    'num_nodes': 4096,
+}
+GREEKS_PARAMETER_LIMITS = {          # Bornes des demandes avec grecques (repricées plusieurs fois chacune)
+    'num_simulations': 10**5,
+    'num_steps': 500,
+    'steps': 2000,
+    'num_space': 2000,
+}
+GREEKS_REPRICINGS = 7                # Pricings par demande avec grecques (prix, delta et gamma, vega, theta)
+MAX_BATCH_COST = 10**9               # Coût total d'un lot (trajectoires x pas de temps, ou points de grille)
+EXCLUDED_PARAMS = ('workers', 'batch_size', 'S_grid', 't_grid')  # Arguments des pricers refusés par l'API
+
+pricing_api = Blueprint('pricing_api', __name__, url_prefix='/api')
+
+
+def _error(message, status=400):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+def _streaming(payload):
+    return bool(payload.get('stream')) or request.args.get('stream') in ('1', 'true')
+
+
+@lru_cache(maxsize=None)
+def _allowed_params(model):
+    """Arguments du constructeur du pricer de model acceptés par l'API."""
+    return frozenset(inspect.signature(MODELS[model]).parameters).difference(EXCLUDED_PARAMS)
+
+
+@lru_cache(maxsize=None)
+def _defaults(model):
+    """Valeurs par défaut des arguments du constructeur du pricer de model."""
+    return {name: parameter.default for name, parameter in inspect.signature(MODELS[model]).parameters.items()
+            if parameter.default is not inspect.Parameter.empty}
+
+
+def _cost(model, params):
+    """Coût d'une demande : trajectoires x pas de temps en Monte Carlo, points de la grille en arbre ou en EDP.
+
+    Les formules fermées, quadratures et FFT comptent pour 1.
+    """
+    if model not in MODELS:
+        return 0
+    values = dict(_defaults(model), **params)
+    if model == 'BINOMIAL':
+        return values['steps']**2 / 2
+    if values.get('method', 'mc') == 'pde':
+        return values['num_space'] * values['num_steps']  # Grille de l'EDP : num_steps pas de temps
+    if values.get('method', 'mc') == 'mc' and 'num_simulations' in values:
+        return values['num_simulations'] * values.get('num_steps', 1)
+    return 1
+
+
+def _scalar(value):
+    return value is None or isinstance(value, (bool, int, float, str))
+
+
+def _validate(payload):
+    """Message d'erreur si le corps de la requête est invalide ou dépasse les limites, sinon None."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('requests'), list):
+        return "Body must be a JSON object with a 'requests' list"
+    requests = payload['requests']
+    max_size = MAX_STREAM_BATCH_SIZE if _streaming(payload) else MAX_BATCH_SIZE
+    if len(requests) > max_size:
+        return "Too many requests in one batch (%d > %d)" % (len(requests), max_size)
+    if payload.get('greeks') and len(requests) > MAX_GREEKS_BATCH_SIZE:
+        return "Too many requests with greeks in one batch (%d > %d)" % (len(requests), MAX_GREEKS_BATCH_SIZE)
+    for index, item in enumerate(requests):
+        if not isinstance(item, dict) or not isinstance(item.get('model'), str) \
+                or not isinstance(item.get('params'), dict):
+            return "requests[%d] must be an object with a 'model' string and a 'params' object" % index
+        params = item['params']
+        if item['model'] in MODELS:
+            unknown = sorted(set(params).difference(_allowed_params(item['model'])))
+            if unknown:
+                return "requests[%d]: unsupported parameter(s) for %s: %s" % (index, item['model'], ', '.join(unknown))
+        for name, value in params.items():
+            if not (_scalar(value) or name == 'variance_reduction' and isinstance(value, list)
+                    and all(isinstance(x, str) for x in value)):
+                return "requests[%d]: %s must be a scalar" % (index, name)
+        for name, limit in PARAMETER_LIMITS.items():
+            value = params.get(name)
+            if value is not None and (not isinstance(value, (int, float)) or value > limit):
+                return "requests[%d]: %s must be a number not above %d" % (index, name, limit)
+        if payload.get('greeks'):
+            for name, limit in GREEKS_PARAMETER_LIMITS.items():
+                value = params.get(name)
+                if value is not None and value > limit:
+                    return "requests[%d]: %s must not be above %d with greeks" % (index, name, limit)
+    return None
+
+
+def _batch_cost(payload):
+    """Coût total du lot (déjà validé), multiplié par le nombre de repricings si les grecques sont demandées."""
+    cost = sum(_cost(item['model'], item['params']) for item in payload['requests'])
+    return cost * GREEKS_REPRICINGS if payload.get('greeks') else cost
+
+
+def _results(requests, greeks):
+    """Résultats dans l'ordre des demandes, avec l'id de chaque demande qui en a un."""
+    for item, result in zip(requests, iter_price_batch(requests, greeks, chunk_size=STREAM_CHUNK_SIZE)):
+        if 'id' in item:
+            result = {'id': item['id'], **result}
+        yield result
+
+
+@pricing_api.route('/price', methods=['POST'])
+def price():
+    """Prix (et grecques si demandées) d'un lot d'options, en JSON ou en NDJSON (streaming)."""
+    request.max_content_length = MAX_CONTENT_LENGTH  # Corps plus gros : 413 à la lecture
+    payload = request.get_json(silent=True)
+    message = _validate(payload)
+    if message is not None:
+        return _error(message)
+    cost = _batch_cost(payload)
+    if cost > MAX_BATCH_COST:
+        return _error("Batch too expensive (cost %.3g > %.3g): use fewer requests, simulations or steps"
+                      % (cost, MAX_BATCH_COST), 413)
+    requests = payload['requests']
+    greeks = bool(payload.get('greeks'))
+    if _streaming(payload):
+        lines = (json.dumps(result) + '\n' for result in _results(requests, greeks))
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+    return jsonify({'results': list(_results(requests, greeks))})
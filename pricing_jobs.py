@@ -0,0 +1,97 @@
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# File de calculs de pricing en arrière-plan pour l'application Dash
+# Un callback soumet un calcul et rend la main immédiatement ; le navigateur interroge ensuite l'état du calcul
+# (dcc.Interval) et affiche les résultats partiels à mesure qu'ils arrivent.
+# Les calculs tournent dans un pool de threads borné : les workers gunicorn ne restent plus bloqués sur un pricing,
+# et la charge de calcul est plafonnée quel que soit le nombre d'utilisateurs.
+# Un calcul dépassé (paramètres modifiés entre-temps) est annulé : retiré de la file s'il n'a pas commencé,
+# sinon interrompu au prochain point de contrôle (job.cancelled, testé entre deux lignes de la grille).
+# L'état des calculs est propre au processus : avec gunicorn, servir l'application par un seul processus et plusieurs
+# threads (--workers 1 --threads N) pour que les requêtes de suivi atteignent le processus qui calcule.
+
+
+class Pricing_job:
+    def __init__(self, job_id, result):
+        self.id = job_id
+        self.status = 'pending'  # 'pending', 'running', 'done', 'cancelled' ou 'error'
+        self.version = 0         # Incrémentée à chaque mise à jour du résultat
+        self.result = dict(result)
+        self.future = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+    def update(self, **values):
+        """Publie des résultats (partiels) du calcul."""
+        with self._lock:
+            self.result.update(values)
+            self.version += 1
+
+    def snapshot(self):
+        """État courant : statut, version et copie du résultat."""
+        with self._lock:
+            return {'id': self.id, 'status': self.status, 'version': self.version, **self.result}
+
+
+class Pricing_jobs:
+    def __init__(self, max_workers=4, max_jobs=256):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pricing')
+        self.max_jobs = max_jobs  # Nombre de calculs terminés conservés pour le suivi
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, function, *args, initial=None):
+        """Lance function(job, *args) en arrière-plan et renvoie l'identifiant du calcul.
+
+        initial : résultat disponible immédiatement (par exemple les axes de la grille).
+        """
+        job = Pricing_job(next(self._ids), initial or {})
+        with self.lock:
+            self.jobs[job.id] = job
+            self._forget_finished()
+        job.future = self.executor.submit(self._run, job, function, args)
+        return job.id
+
+    def _run(self, job, function, args):
+        if job.cancelled:
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        try:
+            function(job, *args)
+        except Exception as e:
+            job.update(error=str(e))
+            job.status = 'error'
+            return
+        job.status = 'cancelled' if job.cancelled else 'done'
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ('done', 'cancelled', 'error')]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def cancel(self, job_id):
+        """Annule un calcul dépassé (sans effet si l'identifiant est inconnu ou le calcul terminé)."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def get(self, job_id):
+        """État du calcul (voir Pricing_job.snapshot), ou None s'il est inconnu."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return None if job is None else job.snapshot()